@@ -1,78 +1,336 @@
 # Pillowを使って画像のB成分のみを抽出し新しい画像として保存するサンプル
 
 # Pillow, tkinterを使ってファイルダイアログから画像を選択し、R/G/Bのどれかを抽出して保存
+# コマンドライン引数を渡すとtkinterを使わないバッチモードで動作
+#   python ColorExtract.py images/ "videos/*.mp4" -c R -j 8 -o "out/{stem}_{channel}{ext}"
 
 from PIL import Image
-import tkinter as tk
-from tkinter import filedialog, simpledialog, messagebox
+import numpy as np
+import argparse
+import glob
 import os
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def extract_channel_image(input_path, output_path, channel):
+# チャンネル指定で使う色空間ごとの成分名
+RGB_CHANNELS = {'R': 0, 'G': 1, 'B': 2}
+HSV_CHANNELS = {'H': 0, 'S': 1, 'V': 2}
+LAB_CHANNELS = {'L': 0, 'A': 1, 'B': 2}
+# 輝度 (ITU-R BT.601) の重み
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+def parse_channel_spec(channel):
+	"""
+	チャンネル指定文字列を (色空間, 重み) に変換します。
+
+	- 'R', 'G', 'B', 'R+B', '0.5R+2B' : 指定チャンネルを重み付きで残し、他は0 (RGB出力)
+	- 'Y' / 'LUMA'                   : 輝度 (0.299R+0.587G+0.114B) のグレースケール
+	- 'GRAY:0.2R+0.8G'               : 重み付き和のグレースケール
+	- 'HSV:H', 'H', 'S', 'V'          : HSVの1成分のグレースケール
+	- 'LAB:L', 'LAB:A', 'LAB:B'       : Labの1成分のグレースケール
+	"""
+	spec = channel.replace(' ', '').upper()
+	if spec in ('Y', 'LUMA'):
+		return 'GRAY', LUMA_WEIGHTS
+	if spec in HSV_CHANNELS:
+		spec = 'HSV:' + spec
+	space, sep, rest = spec.partition(':')
+	if sep and space in ('HSV', 'LAB'):
+		names = HSV_CHANNELS if space == 'HSV' else LAB_CHANNELS
+		if rest not in names:
+			raise ValueError(f'不正なチャンネル指定です: {channel}')
+		weights = [0.0, 0.0, 0.0]
+		weights[names[rest]] = 1.0
+		return space, tuple(weights)
+	if sep and space != 'GRAY':
+		raise ValueError(f'不正なチャンネル指定です: {channel}')
+	terms = (rest if sep else spec).split('+')
+	weights = [0.0, 0.0, 0.0]
+	for term in terms:
+		m = re.fullmatch(r'(\d*\.?\d*)\*?([RGB])', term)
+		if not m:
+			raise ValueError(f'不正なチャンネル指定です: {channel}')
+		weights[RGB_CHANNELS[m.group(2)]] += float(m.group(1)) if m.group(1) else 1.0
+	return ('GRAY' if sep else 'RGB'), tuple(weights)
+
+def _to_uint8(values):
+	return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+def extract_channel_array(rgb, channel):
+	"""
+	RGB配列 (H, W, 3, uint8) からチャンネルを配列演算で抽出します。
+	RGB指定なら (H, W, 3)、グレースケール指定なら (H, W) の uint8 配列を返します。
+	"""
+	space, weights = parse_channel_spec(channel)
+	if space == 'RGB':
+		out = np.zeros_like(rgb)
+		for idx, w in enumerate(weights):
+			if w == 1.0:
+				out[:, :, idx] = rgb[:, :, idx]
+			elif w != 0.0:
+				out[:, :, idx] = _to_uint8(rgb[:, :, idx] * w)
+		return out
+	if space != 'GRAY':
+		# HSV/Labの1成分はそのまま取り出す
+		src = np.asarray(convert_color_space(Image.fromarray(rgb, 'RGB'), space))
+		idx = weights.index(1.0)
+		if space == 'LAB' and idx > 0:
+			# a*, b* は符号付きで格納されているので、128を足して0〜255に直す
+			return (src[:, :, idx].view(np.int8).astype(np.int16) + 128).astype(np.uint8)
+		return src[:, :, idx].copy()
+	return _to_uint8(rgb @ np.asarray(weights, dtype=np.float32))
+
+def convert_color_space(img, space):
+	if space == 'HSV':
+		return img.convert('HSV')
+	from PIL import ImageCms
+	srgb = ImageCms.createProfile('sRGB')
+	lab = ImageCms.createProfile('LAB')
+	transform = ImageCms.buildTransformFromOpenProfiles(srgb, lab, 'RGB', 'LAB')
+	return ImageCms.applyTransform(img, transform)
+
+def extract_channel_image(input_path, output_path, channel, verbose=True):
+	"""verbose が False なら処理時間を表示しない (バッチモード用)"""
+	start = time.perf_counter()
 	img = Image.open(input_path).convert('RGB')
-	width, height = img.size
-	pixels = img.load()
-	new_img = Image.new('RGB', (width, height))
-	new_pixels = new_img.load()
-	import sys
-	for y in range(height):
-		for x in range(width):
-			r, g, b = pixels[x, y]
-			if channel == 'R':
-				new_pixels[x, y] = (r, 0, 0)
-			elif channel == 'G':
-				new_pixels[x, y] = (0, g, 0)
-			elif channel == 'B':
-				new_pixels[x, y] = (0, 0, b)
-		# 進行度を10%単位で表示
-		if height >= 10 and y % (height // 10) == 0:
-			percent = int(y / height * 100)
-			print(f"進行度: {percent}%")
-			sys.stdout.flush()
-	print("進行度: 100%")
-	new_img.save(output_path)
-
-def extract_channel_video(input_path, output_path, channel):
+	out = extract_channel_array(np.asarray(img), channel)
+	Image.fromarray(out, 'RGB' if out.ndim == 3 else 'L').save(output_path)
+	if verbose:
+		print(f"処理時間: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def print_progress(frame_num, total_frames, fps):
+	"""extract_channel_video の既定の進行度コールバック"""
+	if total_frames > 0:
+		print(f"進行度: {min(frame_num / total_frames * 100, 100):.0f}% ({frame_num}/{total_frames}フレーム, {fps:.1f} fps)")
+	else:
+		print(f"進行度: {frame_num}フレーム ({fps:.1f} fps)")
+	sys.stdout.flush()
+
+def make_frame_writer(channel):
+	"""
+	BGRフレームから抽出結果を出力バッファへ書き込む関数を返します。
+	出力バッファは使い回すため、書き込まないチャンネルは初期値の0のまま残ります。
+	"""
+	space, weights = parse_channel_spec(channel)
+	if space == 'RGB':
+		# RGBの重みをBGRの並びに対応させる
+		bgr_weights = [(2 - idx, w) for idx, w in enumerate(weights) if w != 0.0]
+		def write(src, dst):
+			for bgr_idx, w in bgr_weights:
+				if w == 1.0:
+					np.copyto(dst[:, :, bgr_idx], src[:, :, bgr_idx])
+				else:
+					dst[:, :, bgr_idx] = _to_uint8(src[:, :, bgr_idx] * w)
+		return write
+	def write(src, dst):
+		gray = extract_channel_array(np.ascontiguousarray(src[:, :, ::-1]), channel)
+		dst[:, :, :] = gray[:, :, np.newaxis]
+	return write
+
+def _queue_get(q, stop):
+	"""stop が立つまで待ちながらキューから取り出します。中断時は None を返します。"""
+	while not stop.is_set():
+		try:
+			return q.get(timeout=0.1)
+		except queue.Empty:
+			pass
+	return None
+
+def extract_channel_video(input_path, output_path, channel, progress=print_progress, buffers=8, progress_interval=1.0):
+	"""
+	デコード → チャンネル抽出 → エンコードを別スレッドで並行に処理します。
+	各段は有界キューでつながり、フレームバッファは buffers 枚を使い回します。
+	progress(frame_num, total_frames, fps) は progress_interval 秒ごとと終了時に呼ばれます。
+	"""
 	import cv2
-	import sys
 	cap = cv2.VideoCapture(input_path)
 	if not cap.isOpened():
-		messagebox.showerror('エラー', '動画ファイルを開けませんでした')
-		return
+		raise IOError(f'動画ファイルを開けませんでした: {input_path}')
 	fourcc = cv2.VideoWriter_fourcc(*'mp4v')
 	fps = cap.get(cv2.CAP_PROP_FPS)
 	width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
 	height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 	total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 	out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-	channel_idx = {'R':2, 'G':1, 'B':0}[channel]
+	write_frame = make_frame_writer(channel)
+
+	# 使い回すバッファ。空きキューに入っている分だけ各段が先行できる
+	free_in = queue.Queue()
+	free_out = queue.Queue()
+	for _ in range(buffers):
+		free_in.put(np.empty((height, width, 3), dtype=np.uint8))
+		free_out.put(np.zeros((height, width, 3), dtype=np.uint8))
+	decoded = queue.Queue(maxsize=buffers + 1)
+	processed = queue.Queue(maxsize=buffers + 1)
+	stop = threading.Event()
+	errors = []
+
+	def run_stage(body, downstream):
+		try:
+			body()
+		except Exception as e:
+			errors.append(e)
+			stop.set()
+		finally:
+			if downstream is not None:
+				downstream.put(None)
+
+	def decode():
+		while not stop.is_set():
+			buf = _queue_get(free_in, stop)
+			if buf is None:
+				return
+			ret, frame = cap.read(buf)
+			if not ret:
+				return
+			decoded.put(frame)
+
+	def process():
+		while True:
+			frame = _queue_get(decoded, stop)
+			if frame is None:
+				return
+			dst = _queue_get(free_out, stop)
+			if dst is None:
+				return
+			write_frame(frame, dst)
+			free_in.put(frame)
+			processed.put(dst)
+
 	frame_num = 0
-	next_percent = 0
-	while True:
-		ret, frame = cap.read()
-		if not ret:
-			break
-		zeros = frame.copy()
-		zeros[:,:,:] = 0
-		zeros[:,:,channel_idx] = frame[:,:,channel_idx]
-		out.write(zeros)
-		frame_num += 1
-		# 進行度を10%単位で表示
-		if total_frames > 0:
-			percent = int(frame_num / total_frames * 100)
-			if percent >= next_percent and percent <= 100:
-				print(f"進行度: {percent}%")
-				sys.stdout.flush()
-				next_percent += 10
-	print("進行度: 100%")
+	def encode():
+		nonlocal frame_num
+		start = last_report = time.perf_counter()
+		while True:
+			dst = _queue_get(processed, stop)
+			if dst is None:
+				break
+			out.write(dst)
+			free_out.put(dst)
+			frame_num += 1
+			now = time.perf_counter()
+			if progress is not None and now - last_report >= progress_interval:
+				progress(frame_num, total_frames, frame_num / (now - start))
+				last_report = now
+		if progress is not None:
+			progress(frame_num, total_frames, frame_num / max(time.perf_counter() - start, 1e-9))
+
+	threads = [
+		threading.Thread(target=run_stage, args=(decode, decoded), daemon=True),
+		threading.Thread(target=run_stage, args=(process, processed), daemon=True),
+		threading.Thread(target=run_stage, args=(encode, None), daemon=True),
+	]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
 	cap.release()
 	out.release()
+	if errors:
+		raise errors[0]
+	return frame_num
+
+VIDEO_EXTS = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm']
+IMAGE_EXTS = ['.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff']
 
 def is_video_file(path):
 	ext = os.path.splitext(path)[1].lower()
-	return ext in ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm']
+	return ext in VIDEO_EXTS
+
+def collect_inputs(patterns, recursive=False):
+	"""ディレクトリまたはglobパターンから処理対象の画像/動画ファイルを列挙します。"""
+	paths = []
+	for pattern in patterns:
+		if os.path.isdir(pattern):
+			pattern = os.path.join(pattern, '**', '*') if recursive else os.path.join(pattern, '*')
+		for path in sorted(glob.glob(pattern, recursive=True)):
+			ext = os.path.splitext(path)[1].lower()
+			if os.path.isfile(path) and (ext in IMAGE_EXTS or ext in VIDEO_EXTS):
+				paths.append(path)
+	# 重複を除き順序は保持
+	return list(dict.fromkeys(paths))
+
+def format_output_path(template, input_path, channel):
+	"""出力テンプレートの {dir} {name} {stem} {ext} {channel} を展開します。"""
+	stem, ext = os.path.splitext(os.path.basename(input_path))
+	return template.format(
+		dir=os.path.dirname(input_path) or '.',
+		name=os.path.basename(input_path),
+		stem=stem,
+		ext=ext,
+		channel=re.sub(r'[^0-9A-Za-z.+]', '-', channel),
+	)
+
+def is_up_to_date(input_path, output_path):
+	return os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+def process_file(input_path, output_path, channel):
+	"""バッチモードの1ファイル分の処理 (プロセスプールのワーカーで実行)"""
+	os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+	if is_video_file(input_path):
+		extract_channel_video(input_path, output_path, channel, progress=None)
+	else:
+		extract_channel_image(input_path, output_path, channel, verbose=False)
+	return os.path.getsize(input_path)
+
+def batch_main(argv):
+	parser = argparse.ArgumentParser(description='画像/動画のチャンネル抽出をまとめて実行します')
+	parser.add_argument('inputs', nargs='+', help='入力ディレクトリまたはglobパターン')
+	parser.add_argument('-c', '--channel', required=True, help='抽出するチャンネル (R, G, B, R+B, Y, HSV:H, LAB:L など)')
+	parser.add_argument('-o', '--output', default='{dir}/{stem}_{channel}{ext}',
+		help='出力パスのテンプレート ({dir} {name} {stem} {ext} {channel})')
+	parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='並列ワーカー数')
+	parser.add_argument('-r', '--recursive', action='store_true', help='ディレクトリを再帰的に探索')
+	parser.add_argument('-f', '--force', action='store_true', help='出力が最新でも再処理する')
+	args = parser.parse_args(argv)
+
+	try:
+		parse_channel_spec(args.channel)
+	except ValueError as e:
+		parser.error(str(e))
+	channel = args.channel.replace(' ', '').upper()
+
+	inputs = collect_inputs(args.inputs, args.recursive)
+	outputs = [format_output_path(args.output, path, channel) for path in inputs]
+	# 以前の実行の出力が入力側に含まれていても再処理しない
+	produced = {os.path.abspath(path) for path in outputs}
+	tasks = []
+	skipped = 0
+	for input_path, output_path in zip(inputs, outputs):
+		if os.path.abspath(input_path) in produced:
+			continue
+		if not args.force and is_up_to_date(input_path, output_path):
+			skipped += 1
+			continue
+		tasks.append((input_path, output_path))
+	print(f"対象: {len(tasks)}件 (最新のためスキップ: {skipped}件)")
+
+	start = time.perf_counter()
+	done = 0
+	failed = 0
+	total_bytes = 0
+	with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+		futures = {executor.submit(process_file, i, o, channel): i for i, o in tasks}
+		for future in as_completed(futures):
+			try:
+				total_bytes += future.result()
+				done += 1
+			except Exception as e:
+				failed += 1
+				print(f"失敗: {futures[future]}: {e}", file=sys.stderr)
+	elapsed = max(time.perf_counter() - start, 1e-9)
+	print(f"完了: {done}件 失敗: {failed}件 スキップ: {skipped}件 "
+		f"{elapsed:.2f}秒 ({done / elapsed:.2f} files/s, {total_bytes / elapsed / 1e6:.2f} MB/s)")
+	return 1 if failed else 0
 
 
 def main():
+	import tkinter as tk
+	from tkinter import filedialog, simpledialog, messagebox
 	root = tk.Tk()
 	root.withdraw()  # メインウィンドウを表示しない
 
@@ -89,11 +347,13 @@ def main():
 		return
 
 	# チャンネル選択
-	channel = simpledialog.askstring('チャンネル選択', '抽出するチャンネルを入力してください (R, G, B):')
-	if not channel or channel.upper() not in ['R', 'G', 'B']:
+	channel = simpledialog.askstring('チャンネル選択', '抽出するチャンネルを入力してください (R, G, B, R+B, Y, HSV:H, LAB:L など):')
+	try:
+		parse_channel_spec(channel or '')
+	except ValueError:
 		messagebox.showinfo('中止', '正しいチャンネルが選択されませんでした')
 		return
-	channel = channel.upper()
+	channel = channel.replace(' ', '').upper()
 
 	# 保存ファイル選択
 	if is_video_file(input_path):
@@ -113,10 +373,16 @@ def main():
 		except ImportError:
 			messagebox.showerror('エラー', '動画処理にはopencv-pythonが必要です。\npip install opencv-python でインストールしてください。')
 			return
-		extract_channel_video(input_path, output_path, channel)
+		try:
+			extract_channel_video(input_path, output_path, channel)
+		except IOError as e:
+			messagebox.showerror('エラー', str(e))
+			return
 	else:
 		extract_channel_image(input_path, output_path, channel)
 	messagebox.showinfo('完了', f'保存しました: {output_path}')
 
 if __name__ == "__main__":
+	if len(sys.argv) > 1:
+		sys.exit(batch_main(sys.argv[1:]))
 	main()
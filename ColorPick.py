@@ -1,11 +1,157 @@
 # シンプルなカラーピッカーアプリ
 # 画像をダイアログから読み込み、クリックした座標とRGB値をコンソールに表示
+# 領域の大きさを2以上にすると、周辺の平均・中央値・標準偏差 (RGB/HSV/Lab) も表示
 
+import math
 import tkinter as tk
+from collections import OrderedDict
 from tkinter import filedialog
-from PIL import Image, ImageTk
+import numpy as np
+from PIL import Image
+from ColorExtract import convert_color_space
+from ImagePyramid import ImagePyramid, PyramidCanvas, open_image_source
 
+SAT_BLOCK = 512  # 積分画像を作るブロックの大きさ
+SAT_CACHE_BYTES = 64 * 1024 * 1024  # 保持する積分画像の合計サイズの上限
+HUE_PERIOD = 255  # HSVの色相 (0〜255) の1周 (SPACE_SCALES の 360 / 255 と合わせる)
+HOVER_INTERVAL_MS = 16  # ホバー表示を更新する間隔 (画面の更新間隔に合わせる)
 
+# 色空間ごとの表示単位への倍率。HSVは度と%、LabはL*を0〜100に直す
+SPACE_SCALES = {
+    'RGB': np.array([1.0, 1.0, 1.0]),
+    'HSV': np.array([360 / 255, 100 / 255, 100 / 255]),
+    'LAB': np.array([100 / 255, 1.0, 1.0]),
+}
+
+
+def color_values(rgb, space):
+    """
+    RGB配列 (高さ, 幅, 3) を指定した色空間の整数値 (int64) に変換します。
+    表示単位にするには SPACE_SCALES の倍率を掛けます。
+    """
+    if space == 'RGB':
+        return rgb.astype(np.int64)
+    values = np.asarray(convert_color_space(Image.fromarray(np.ascontiguousarray(rgb)), space)).astype(np.int64)
+    if space == 'LAB':
+        values[..., 1:] -= 256 * (values[..., 1:] > 127)  # a*, b* は符号付きで格納されている
+    return values
+
+
+class RegionStats:
+    """
+    画像ソースの周辺領域の平均・標準偏差を積分画像 (和と二乗和) から求めます。
+    積分画像はブロックごとに必要になった時点で一度だけ作り、合計 max_bytes までLRUで保持するので、
+    メモリマップした巨大な画像でも全体を読み込まずに済みます。
+    中央値と、円周上の値であるHSVの色相は、積分画像からは求められないので領域の画素から直接計算します。
+    """
+    def __init__(self, source, space='RGB', block=SAT_BLOCK, max_bytes=SAT_CACHE_BYTES):
+        self.source = source
+        self.space = space
+        self.block = block
+        self.max_bytes = max_bytes
+        self.tables = OrderedDict()
+        self.table_bytes = 0
+
+    def _table(self, bx, by):
+        key = (bx, by)
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+            return table
+        x0, y0 = bx * self.block, by * self.block
+        region = self.source.read_region(x0, y0, min(x0 + self.block, self.source.width), min(y0 + self.block, self.source.height))
+        values = color_values(region, self.space)
+        # 先頭に0の行・列を足した積分画像 (和, 二乗和)。整数で持つので誤差が出ない
+        # ブロック内の和は int32 に収まる (512² × 255 < 2³¹) ので、int64 は二乗和だけに使う
+        shape = (values.shape[0] + 1, values.shape[1] + 1, 3)
+        sums = np.zeros(shape, dtype=np.int32)
+        squares = np.zeros(shape, dtype=np.int64)
+        sums[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+        squares[1:, 1:] = (values * values).cumsum(axis=0).cumsum(axis=1)
+        table = (sums, squares)
+        self.tables[key] = table
+        self.table_bytes += sums.nbytes + squares.nbytes
+        while self.table_bytes > self.max_bytes and len(self.tables) > 1:
+            _, (old_sums, old_squares) = self.tables.popitem(last=False)
+            self.table_bytes -= old_sums.nbytes + old_squares.nbytes
+        return table
+
+    def rect_sums(self, x0, y0, x1, y1):
+        """範囲 [x0, x1) × [y0, y1) の (和, 二乗和) をブロックごとの4点の参照で求めます。"""
+        sums = np.zeros((2, 3), dtype=np.int64)
+        for by in range(y0 // self.block, (y1 - 1) // self.block + 1):
+            for bx in range(x0 // self.block, (x1 - 1) // self.block + 1):
+                ox, oy = bx * self.block, by * self.block
+                ax, ay = max(x0, ox) - ox, max(y0, oy) - oy
+                bx1, by1 = min(x1, ox + self.block) - ox, min(y1, oy + self.block) - oy
+                for i, table in enumerate(self._table(bx, by)):
+                    sums[i] += table[by1, bx1].astype(np.int64) - table[ay, bx1] - table[by1, ax] + table[ay, ax]
+        return sums
+
+    def spans(self, x, y, size, shape):
+        """(x, y) を中心とする領域を画像内に収まる行ごとの範囲 (y, x0, x1) に分けます。"""
+        radius = size // 2
+        rows = []
+        for dy in range(-radius, size - radius):
+            row = y + dy
+            if not 0 <= row < self.source.height:
+                continue
+            half = radius if shape == 'square' else int(math.sqrt(max(radius * radius - dy * dy, 0)))
+            x0 = max(x - half, 0)
+            x1 = min(x + (half if shape == 'circle' else size - radius - 1) + 1, self.source.width)
+            if x0 < x1:
+                rows.append((row, x0, x1))
+        return rows
+
+    def measure(self, x, y, size=1, shape='square', median=True):
+        """
+        (x, y) を中心とする size×size の正方形 (shape='circle' なら直径 size の円) の
+        平均・標準偏差・中央値を返します。正方形は O(1)、円は行数に比例する参照で求めます。
+        HSVの色相は円周平均のまわりに展開してから求めるので、0/360度をまたぐ赤でも正しくなります。
+        """
+        rows = self.spans(x, y, size, shape)
+        count = sum(x1 - x0 for _, x0, x1 in rows)
+        if shape == 'square':
+            sums = self.rect_sums(rows[0][1], rows[0][0], rows[0][2], rows[-1][0] + 1)
+        else:
+            sums = sum(self.rect_sums(x0, row, x1, row + 1) for row, x0, x1 in rows)
+        scale = SPACE_SCALES[self.space]
+        mean = sums[0] / count
+        variance = (sums[1] * count - sums[0] * sums[0]) / (count * count)
+        std = np.sqrt(variance)
+        if median or self.space == 'HSV':
+            top, bottom = rows[0][0], rows[-1][0] + 1
+            left, right = min(r[1] for r in rows), max(r[2] for r in rows)
+            values = color_values(self.source.read_region(left, top, right, bottom), self.space)
+            mask = np.zeros(values.shape[:2], dtype=bool)
+            for row, x0, x1 in rows:
+                mask[row - top, x0 - left:x1 - left] = True
+            values = values[mask].astype(np.float64)
+            if self.space == 'HSV':
+                values[:, 0] = unwrap_hue(values[:, 0])
+                mean[0] = values[:, 0].mean()
+                std[0] = values[:, 0].std()
+            if median:
+                middle = np.median(values, axis=0)
+        if self.space == 'HSV':
+            mean[0] %= HUE_PERIOD
+        result = {'count': count, 'mean': mean * scale, 'std': std * scale}
+        if median:
+            if self.space == 'HSV':
+                middle[0] %= HUE_PERIOD
+            result['median'] = middle * scale
+        return result
+
+
+def unwrap_hue(hue):
+    """色相の配列を円周平均のまわり (±HUE_PERIOD/2) に展開し、平均や中央値を線形に求められるようにします。"""
+    angle = hue * (2 * np.pi / HUE_PERIOD)
+    center = np.arctan2(np.sin(angle).sum(), np.cos(angle).sum()) * HUE_PERIOD / (2 * np.pi)
+    return center + (hue - center + HUE_PERIOD / 2) % HUE_PERIOD - HUE_PERIOD / 2
+
+
+def format_values(values):
+    return '(' + ', '.join(f'{v:.1f}' for v in values) + ')'
 
 
 class ColorPickerApp:
@@ -25,81 +171,100 @@ class ColorPickerApp:
         select_btn = tk.Button(top_frame, text='画像を選択', command=self.load_image)
         select_btn.pack(side=tk.LEFT, padx=5, pady=5)
 
+        # 周辺領域の大きさ・形・色空間
+        region_frame = tk.Frame(root)
+        region_frame.pack(side=tk.TOP, fill=tk.X)
+        tk.Label(region_frame, text='領域').pack(side=tk.LEFT, padx=5)
+        self.region_size = tk.Spinbox(region_frame, from_=1, to=255, increment=2, width=4)
+        self.region_size.pack(side=tk.LEFT)
+        self.region_shape = tk.StringVar(value='square')
+        tk.OptionMenu(region_frame, self.region_shape, 'square', 'circle').pack(side=tk.LEFT)
+        self.color_space = tk.StringVar(value='RGB')
+        tk.OptionMenu(region_frame, self.color_space, 'RGB', 'HSV', 'LAB').pack(side=tk.LEFT)
+
         # 座標・RGB表示ラベル
         self.info_label = tk.Label(top_frame, text='座標: (-, -)  RGB: (-, -, -)')
         self.info_label.pack(side=tk.LEFT, padx=10)
+        self.stats_label = tk.Label(region_frame, text='')
+        self.stats_label.pack(side=tk.LEFT, padx=10)
 
         # キャンバス
         self.canvas = tk.Canvas(root, width=self.window_width, height=self.window_height)
         self.canvas.pack()
-        self.img = None
-        self.photo = None
-        self.pixels = None
-        self.scale_x = 1.0
-        self.scale_y = 1.0
+        # 表示範囲のタイルだけを描画 (ホイールで拡大・縮小、右ドラッグで移動)
+        self.view = PyramidCanvas(self.canvas, self.window_width, self.window_height, allow_upscale=False)
+        self.pyramid = None
+        self.region_stats = None  # 今の色空間の RegionStats
+        self.hover_point = None  # 最後にマウスがあった位置
+        self.hover_pending = False
 
     def load_image(self):
-        file_path = filedialog.askopenfilename(title='画像ファイルを選択', filetypes=[('画像ファイル', '*.png;*.jpg;*.jpeg;*.bmp;*.tif;*.tiff')])
+        file_path = filedialog.askopenfilename(title='画像ファイルを選択', filetypes=[('画像ファイル', '*.png;*.jpg;*.jpeg;*.bmp;*.tif;*.tiff;*.npy')])
         if not file_path:
             print('画像ファイルが選択されませんでした')
             return
-        self.img = Image.open(file_path).convert('RGB')
-        img_w, img_h = self.img.size
-        # 拡大縮小率を計算
-        scale_x = self.window_width / img_w
-        scale_y = self.window_height / img_h
-        scale = min(scale_x, scale_y, 1.0)  # 拡大はしない
-        disp_w = int(img_w * scale)
-        disp_h = int(img_h * scale)
-        self.scale_x = img_w / disp_w
-        self.scale_y = img_h / disp_h
-        resized_img = self.img.resize((disp_w, disp_h), Image.LANCZOS)
-        self.photo = ImageTk.PhotoImage(resized_img)
-        self.canvas.config(width=self.window_width, height=self.window_height)
-        self.canvas.delete('all')
-        # 画像を中央に表示
-        x_offset = (self.window_width - disp_w) // 2
-        y_offset = (self.window_height - disp_h) // 2
-        self.canvas.create_image(x_offset, y_offset, anchor='nw', image=self.photo)
-        self.pixels = self.img.load()
-        self.img_disp_offset = (x_offset, y_offset, disp_w, disp_h)
+        # 無圧縮のBMP/TIFFはメモリマップし、見える範囲と指した画素だけを読む
+        self.pyramid = ImagePyramid(open_image_source(file_path))
+        self.view.set_pyramid(self.pyramid)
+        self.region_stats = None
         self.canvas.bind('<Button-1>', self.on_click)
         self.canvas.bind('<Motion>', self.on_motion)
         self.info_label.config(text='座標: (-, -)  RGB: (-, -, -)')
+        self.stats_label.config(text='')
 
     def get_img_coords(self, event):
-        if not hasattr(self, 'img_disp_offset'):
-            return None, None
-        x_offset, y_offset, disp_w, disp_h = self.img_disp_offset
-        x = event.x - x_offset
-        y = event.y - y_offset
-        if 0 <= x < disp_w and 0 <= y < disp_h:
-            img_x = int(x * self.scale_x)
-            img_y = int(y * self.scale_y)
-            if 0 <= img_x < self.img.width and 0 <= img_y < self.img.height:
-                return img_x, img_y
-        return None, None
+        # 表示倍率に関係なく原寸の座標を返す
+        return self.view.canvas_to_image(event.x, event.y)
+
+    def measure_region(self, img_x, img_y):
+        """現在の設定で周辺領域の統計を求める (大きさ1で RGB なら None)"""
+        size = max(1, int(self.region_size.get()))
+        space = self.color_space.get()
+        if size == 1 and space == 'RGB':
+            return None
+        # 積分画像は今の色空間の分だけ保持する
+        if self.region_stats is None or self.region_stats.space != space:
+            self.region_stats = RegionStats(self.pyramid.source, space)
+        return self.region_stats.measure(img_x, img_y, size, self.region_shape.get())
+
+    def format_stats(self, stats):
+        space = self.color_space.get()
+        return f'{space} 平均: {format_values(stats["mean"])}  中央値: {format_values(stats["median"])}  標準偏差: {format_values(stats["std"])}'
 
     def on_click(self, event):
-        if self.img is None:
+        if self.pyramid is None:
             return
         img_x, img_y = self.get_img_coords(event)
         if img_x is not None and img_y is not None:
-            r, g, b = self.pixels[img_x, img_y]
+            r, g, b = self.pyramid.pixel(img_x, img_y)
             print(f'座標: ({img_x}, {img_y}), RGB: ({r}, {g}, {b})')
+            stats = self.measure_region(img_x, img_y)
+            if stats is not None:
+                print(f'  {stats["count"]}画素 {self.format_stats(stats)}')
         else:
             print('画像外をクリックしました')
 
     def on_motion(self, event):
-        if self.img is None:
+        # 表示の更新はまとめて HOVER_INTERVAL_MS ごとに行う
+        self.hover_point = (event.x, event.y)
+        if not self.hover_pending:
+            self.hover_pending = True
+            self.root.after(HOVER_INTERVAL_MS, self.update_hover)
+
+    def update_hover(self):
+        self.hover_pending = False
+        if self.pyramid is None or self.hover_point is None:
             self.info_label.config(text='座標: (-, -)  RGB: (-, -, -)')
             return
-        img_x, img_y = self.get_img_coords(event)
+        img_x, img_y = self.view.canvas_to_image(*self.hover_point)
         if img_x is not None and img_y is not None:
-            r, g, b = self.pixels[img_x, img_y]
+            r, g, b = self.pyramid.pixel(img_x, img_y)
             self.info_label.config(text=f'座標: ({img_x}, {img_y})  RGB: ({r}, {g}, {b})')
+            stats = self.measure_region(img_x, img_y)
+            self.stats_label.config(text='' if stats is None else self.format_stats(stats))
         else:
             self.info_label.config(text='座標: (-, -)  RGB: (-, -, -)')
+            self.stats_label.config(text='')
 
 if __name__ == '__main__':
     root = tk.Tk()
@@ -4,6 +4,40 @@ import shutil
 import tempfile
 from tkinter import Tk, filedialog, simpledialog
 import platform
+import threading
+import time
+import itertools
+import hashlib
+import re
+import subprocess
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import Manager
+
+# 画像の先読み設定
+PREFETCH_WORKERS = 4  # 同時に読み込むスレッド数
+PREFETCH_DEPTH = 16  # 先読みする最大枚数
+PREFETCH_MAX_BYTES = 1024 * 1024 * 1024  # 先読み中の画像の合計サイズの上限
+
+# NAS上のフォルダの扱い ('stream': 直接読み込みながらエンコード, 'copy': 一時フォルダにコピーしてからエンコード)
+NAS_MODE = 'stream'
+NAS_READ_BUFFER = 8 * 1024 * 1024  # NASから読み込む際のバッファサイズ
+NAS_READ_RETRIES = 3  # 読み込みに失敗したときの再試行回数
+
+# 一時フォルダへのコピー設定
+COPY_WORKERS = 8  # 同時にコピーするファイル数
+COPY_CHUNK = 64 * 1024 * 1024  # 1回にコピーするバイト数
+REPORT_INTERVAL = 1.0  # 進捗を表示する間隔 (秒)
+STAGING_DIR = os.path.join(tempfile.gettempdir(), 'CreateVideo')  # コピー先 (元フォルダごとに決まった場所を使う)
+
+# 動画の作成設定
+IMAGE_EXTS = ('.bmp', '.png', '.tif', '.tiff', '.jpg', '.jpeg')
+SORT_PATTERN = None  # ファイル名から連番を取り出す正規表現 (例: r'frame_(\d+)')。None なら自然順ソート
+DEFAULT_FPS = 30  # 表示時間が 1/整数 秒でない場合の出力fps (画像を複製して表示時間を合わせる)
+FIT_MODE = 'pad'  # 解像度の異なる画像の扱い ('pad': 縦横比を保って余白を黒で埋める, 'resize': 引き伸ばす)
+ENCODE_WORKERS = os.cpu_count() or 1  # 並列にエンコードするセグメント数
+MIN_SEGMENT_IMAGES = 200  # 1セグメントあたりの最小枚数 (これより少ない場合は分割しない)
 
 def get_drive_letter(path):
     """
@@ -23,43 +57,388 @@ def is_nas_path(script_path, target_path):
     target_drive = get_drive_letter(target_path)
     return script_drive != target_drive
 
-def copy_with_progress(source_folder, dest_folder):
+def copy_file_fast(src_path, dest_path, chunk_size=COPY_CHUNK):
+    """
+    ファイルをコピーします。copy_file_range / sendfile が使える場合はカーネル内でコピーし、
+    使えない場合は大きなバッファで読み書きします。コピーしたバイト数を返します。
+    """
+    size = os.path.getsize(src_path)
+    with open(src_path, 'rb') as fsrc, open(dest_path, 'wb') as fdst:
+        copied = 0
+        for method in ('copy_file_range', 'sendfile'):
+            if copied >= size or not hasattr(os, method):
+                continue
+            try:
+                # sendfile はコピー先の現在位置に書き込むので位置を合わせておく
+                os.lseek(fdst.fileno(), copied, os.SEEK_SET)
+                while copied < size:
+                    count = min(chunk_size, size - copied)
+                    if method == 'copy_file_range':
+                        n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), count, copied, copied)
+                    else:
+                        n = os.sendfile(fdst.fileno(), fsrc.fileno(), copied, count)
+                    if n == 0:
+                        break
+                    copied += n
+            except OSError:
+                # ファイルシステムが対応していない場合は次の方法で続きからコピー
+                continue
+        if copied < size:
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            shutil.copyfileobj(fsrc, fdst, chunk_size)
+    shutil.copystat(src_path, dest_path)
+    return size
+
+def is_same_file(src_stat, dest_path):
+    """
+    コピー先がサイズと更新時刻の一致するコピー済みファイルかどうかを判定します。
+    (NASのファイルシステムによって時刻の精度が粗いため2秒の誤差を許容)
+    """
+    try:
+        dest_stat = os.stat(dest_path)
+    except OSError:
+        return False
+    return dest_stat.st_size == src_stat.st_size and abs(dest_stat.st_mtime - src_stat.st_mtime) <= 2
+
+def copy_with_progress(source_folder, dest_folder, workers=COPY_WORKERS):
     """
     フォルダを一時ディレクトリにコピーし、進捗を表示します。
+    複数のファイルを並行してコピーし、コピー済み (サイズと更新時刻が一致) のファイルは読み飛ばします。
+    進捗は一定間隔でまとめて表示します。
     """
     # コピーする全ファイルのリストを取得
     all_files = []
     for root, _, files in os.walk(source_folder):
         for file in files:
-            all_files.append(os.path.join(root, file))
+            src_path = os.path.join(root, file)
+            all_files.append((src_path, os.stat(src_path)))
 
     total_files = len(all_files)
-    print(f"コピーするファイル数: {total_files}")
+    total_bytes = sum(st.st_size for _, st in all_files)
+    print(f"コピーするファイル数: {total_files} ({total_bytes / 1e6:.1f} MB)")
+
+    lock = threading.Lock()
+    done_files = 0
+    done_bytes = 0
+    copied_bytes = 0  # 読み飛ばしを除いた実際のコピー量 (速度の計算用)
+    skipped = 0
+    start = last_report = time.perf_counter()
 
-    for index, src_path in enumerate(all_files, start=1):
+    def report(force=False):
+        nonlocal last_report
+        now = time.perf_counter()
+        if not force and now - last_report < REPORT_INTERVAL:
+            return
+        last_report = now
+        rate = copied_bytes / max(now - start, 1e-9) / 1e6
+        print(f"コピー進捗: {done_files}/{total_files} ({done_bytes / max(total_bytes, 1) * 100:.2f}%) {rate:.1f} MB/s")
+
+    def copy_one(src_path, src_stat):
+        nonlocal done_files, done_bytes, copied_bytes, skipped
         # コピー先のパスを生成
         relative_path = os.path.relpath(src_path, source_folder)
         dest_path = os.path.join(dest_folder, relative_path)
+        if is_same_file(src_stat, dest_path):
+            with lock:
+                skipped += 1
+        else:
+            # コピー先のフォルダを作成
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            size = copy_file_fast(src_path, dest_path)
+            with lock:
+                copied_bytes += size
+        with lock:
+            done_files += 1
+            done_bytes += src_stat.st_size
+            report()
 
-        # コピー先のフォルダを作成
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-
-        # ファイルをコピー
-        shutil.copy2(src_path, dest_path)
-
-        # 進捗状況を表示
-        print(f"コピー進捗: {index}/{total_files} ({(index / total_files) * 100:.2f}%)")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(copy_one, src_path, st) for src_path, st in all_files]:
+            future.result()
+    report(force=True)
+    if skipped:
+        print(f"コピー済みのため読み飛ばしたファイル数: {skipped}")
 
 def copy_folder_to_temp(source_folder):
     """
     指定されたフォルダを一時ディレクトリにコピーし、進捗を表示します。
+    コピー先は元フォルダのパスから決まるので、中断した後に同じフォルダを選ぶと
+    コピー済みのファイルを読み飛ばして続きからコピーします。
     """
-    temp_dir = tempfile.mkdtemp()  # 一時ディレクトリ作成
+    key = hashlib.sha1(os.path.abspath(source_folder).encode('utf-8')).hexdigest()[:16]
+    temp_dir = os.path.join(STAGING_DIR, key)
     dest_folder = os.path.join(temp_dir, os.path.basename(source_folder))
     print(f"フォルダを一時ディレクトリにコピー中: {dest_folder}")
     copy_with_progress(source_folder, dest_folder)
     return dest_folder
 
+def prefetch_images(paths, read_func=cv2.imread, workers=PREFETCH_WORKERS, depth=PREFETCH_DEPTH, max_bytes=PREFETCH_MAX_BYTES):
+    """
+    スレッドプールで画像を先読みし、paths の順序どおりに (パス, 画像) を返します。
+    先読み中の画像の合計サイズ (直前に読んだ画像の大きさから見積もる) が max_bytes を超えないように、
+    新しい読み込みの開始を待たせます。読み込みに失敗した画像は None を返します。
+    """
+    paths = iter(paths)
+    pending = deque()  # 読み込み順を保持するための待ち行列 (パス, Future, 見積もりサイズ)
+    reserved = 0
+    estimate = None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def fill():
+            nonlocal reserved
+            while len(pending) < depth:
+                path = next(paths, None)
+                if path is None:
+                    return
+                size = estimate if estimate is not None else os.path.getsize(path)
+                pending.append((path, executor.submit(read_func, path), size))
+                reserved += size
+                if reserved >= max_bytes:
+                    return
+
+        fill()
+        while pending:
+            path, future, size = pending.popleft()
+            image = future.result()
+            reserved -= size
+            if image is not None:
+                estimate = image.nbytes
+            fill()  # 次の読み込みを始めてから返すことで、エンコードと読み込みを重ねる
+            yield path, image
+
+def read_file_sequential(path, buffer_size=NAS_READ_BUFFER):
+    """
+    ファイル全体を大きなバッファで先頭から順に読み込みます。
+    """
+    size = os.path.getsize(path)
+    data = bytearray(size)
+    view = memoryview(data)
+    offset = 0
+    with open(path, 'rb', buffering=0) as f:
+        while offset < size:
+            n = f.readinto(view[offset:offset + buffer_size])
+            if not n:
+                raise IOError(f"ファイルの途中で読み込みが終了しました: {path}")
+            offset += n
+    return data
+
+def decode_image(data):
+    """
+    読み込んだファイルの内容を画像にデコードします。失敗した場合は None を返します。
+    """
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+class StreamingReader:
+    """
+    NAS上の画像を一時フォルダにコピーせず、直接1回だけ読み込んでデコードします。
+    読み込みやデコードに失敗した場合だけ、ファイルをローカルの一時ファイルにコピーしてから再試行し、
+    デコードが終わったらすぐに削除します。状態を持たないので、複数スレッドから呼んだり
+    セグメントのエンコード用にワーカープロセスへ渡したりできます。
+    """
+    def __init__(self, retries=NAS_READ_RETRIES):
+        self.retries = retries
+
+    def __call__(self, path):
+        try:
+            image = decode_image(read_file_sequential(path))
+            if image is not None:
+                return image
+        except OSError as e:
+            print(f"読み込みに失敗しました。再試行します: {path} ({e})")
+        for attempt in range(self.retries):
+            time.sleep(0.5 * 2 ** attempt)
+            try:
+                image = decode_image(self._spill(path))
+                if image is not None:
+                    return image
+            except OSError as e:
+                print(f"再試行 {attempt + 1}/{self.retries} に失敗しました: {path} ({e})")
+        return None
+
+    def _spill(self, path):
+        """ファイルをローカルの一時ファイルにコピーしてから読み込み、一時ファイルは削除します。"""
+        fd, spill_path = tempfile.mkstemp(suffix=os.path.splitext(path)[1])
+        os.close(fd)
+        try:
+            shutil.copyfile(path, spill_path)
+            return read_file_sequential(spill_path)
+        finally:
+            os.remove(spill_path)
+
+def natural_sort_key(name):
+    """
+    ファイル名中の数字を数値として比較するソートキー (img2.bmp が img10.bmp より前になる)
+    """
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+def list_sequence(folder_path, pattern=SORT_PATTERN):
+    """
+    フォルダ内の画像ファイルを並べ替えて返します。
+    pattern を指定した場合は最初のグループの数値順に並べ、一致しないファイルは除外します。
+    """
+    images = [f for f in os.listdir(folder_path) if f.lower().endswith(IMAGE_EXTS)]
+    if pattern is None:
+        return sorted(images, key=natural_sort_key)
+    regex = re.compile(pattern)
+    numbered = [(int(m.group(1)), f) for f in images if (m := regex.search(f))]
+    return [f for _, f in sorted(numbered, key=lambda item: (item[0], natural_sort_key(item[1])))]
+
+def choose_fps(display_time, fps=None):
+    """
+    表示時間から出力fpsを決めます。1/表示時間 が整数ならそのまま使い、
+    そうでなければ DEFAULT_FPS (1/表示時間 の方が大きければそのfps) で画像を複製して表示時間を合わせます。
+    """
+    if fps is not None:
+        return fps
+    rate = 1 / display_time
+    if abs(rate - round(rate)) < 1e-9 and round(rate) >= 1:
+        return round(rate)
+    return max(DEFAULT_FPS, rate)
+
+def compute_repeats(image_count, display_time, fps):
+    """
+    各画像を何フレーム表示するかを返します。累積時間から丸めるため、全体の長さがずれていきません。
+    """
+    ends = np.rint(np.arange(1, image_count + 1) * display_time * fps).astype(int)
+    return np.diff(ends, prepend=0)
+
+def fit_frame(image, width, height, fit=FIT_MODE, canvas=None):
+    """
+    画像を出力解像度に合わせます。'pad' は縦横比を保って縮小・拡大し、余白を黒で埋めます。
+    canvas を渡すとそのバッファに書き込みます。
+    """
+    h, w = image.shape[:2]
+    if (w, h) == (width, height):
+        return image
+    if fit == 'resize':
+        interpolation = cv2.INTER_AREA if w > width or h > height else cv2.INTER_LINEAR
+        return cv2.resize(image, (width, height), interpolation=interpolation)
+    scale = min(width / w, height / h)
+    new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    resized = cv2.resize(image, (new_w, new_h), interpolation=interpolation)
+    if canvas is None:
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    else:
+        canvas[:] = 0
+    x, y = (width - new_w) // 2, (height - new_h) // 2
+    canvas[y:y + new_h, x:x + new_w] = resized
+    return canvas
+
+def write_frames(video_writer, frames, repeats, width, height, fit=FIT_MODE, progress=None):
+    """
+    (パス, 画像) を順に出力解像度に合わせ、repeats の回数ずつ書き込みます。
+    読み込めなかった画像は直前の画像で置き換え、全体の長さを保ちます。
+    """
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    last = canvas.copy()
+    for index, ((image_path, image), repeat) in enumerate(zip(frames, repeats)):
+        if image is None:
+            print(f"画像の読み込みに失敗しました: {image_path}")
+        else:
+            last = fit_frame(image, width, height, fit, canvas)
+        for _ in range(repeat):
+            video_writer.write(last)
+        if progress is not None:
+            progress(index + 1)
+
+def encode_segment(image_paths, repeats, save_path, fps, width, height, fit=FIT_MODE, read_func=cv2.imread,
+                   prefetch_workers=PREFETCH_WORKERS, prefetch_depth=PREFETCH_DEPTH, prefetch_bytes=PREFETCH_MAX_BYTES,
+                   progress_queue=None):
+    """
+    画像列の一部を1つの動画ファイルにエンコードします (プロセスプールのワーカーで実行)。
+    先読みの設定は、同時に動く全セグメントの合計が上限に収まるように呼び出し側で分けて渡します。
+    progress_queue を渡すと、REPORT_INTERVAL ごとに前回から書き込んだ画像の枚数を送ります。
+    """
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # MP4形式
+    video_writer = cv2.VideoWriter(save_path, fourcc, fps, (width, height))
+    frames = prefetch_images(image_paths, read_func, prefetch_workers, prefetch_depth, prefetch_bytes)
+    progress = None
+    if progress_queue is not None:
+        reported = 0
+        last_report = time.perf_counter()
+
+        def progress(index):
+            nonlocal reported, last_report
+            now = time.perf_counter()
+            if now - last_report >= REPORT_INTERVAL or index == len(image_paths):
+                progress_queue.put(index - reported)
+                reported = index
+                last_report = now
+
+    write_frames(video_writer, frames, repeats, width, height, fit, progress)
+    video_writer.release()
+    return save_path
+
+def concat_segments(segment_paths, save_path):
+    """
+    ffmpeg の concat で再エンコードせずにセグメントを連結します。
+    """
+    list_path = os.path.join(os.path.dirname(segment_paths[0]), 'segments.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in segment_paths:
+            escaped = path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                    '-i', list_path, '-c', 'copy', save_path], check=True)
+
+def encode_sequence(image_paths, save_path, fps, repeats, width, height, fit=FIT_MODE,
+                    read_func=cv2.imread, workers=ENCODE_WORKERS, first_image=None):
+    """
+    画像列を動画にエンコードします。ffmpeg が使える長い画像列は、セグメントに分けて
+    並列にエンコードしてから連結します。それ以外は1つのライターで順にエンコードします。
+    """
+    total_images = len(image_paths)
+    segments = min(workers, total_images // MIN_SEGMENT_IMAGES)
+    if segments >= 2 and shutil.which('ffmpeg'):
+        bounds = np.linspace(0, total_images, segments + 1).astype(int)
+        segment_dir = tempfile.mkdtemp()
+        segment_paths = [os.path.join(segment_dir, f"segment_{i:04d}.mp4") for i in range(segments)]
+        # 先読みのスレッド数・枚数・バイト数はセグメント全体で1本分の上限を分け合う
+        prefetch = (max(1, PREFETCH_WORKERS // segments), max(2, PREFETCH_DEPTH // segments),
+                    PREFETCH_MAX_BYTES // segments)
+        try:
+            with Manager() as manager, ProcessPoolExecutor(max_workers=segments) as executor:
+                progress_queue = manager.Queue()
+                pending = {
+                    executor.submit(encode_segment, image_paths[a:b], repeats[a:b], path, fps, width, height, fit,
+                                    read_func, *prefetch, progress_queue)
+                    for a, b, path in zip(bounds[:-1], bounds[1:], segment_paths)
+                }
+                written = 0
+                while pending:
+                    finished, pending = wait(pending, timeout=REPORT_INTERVAL)
+                    for future in finished:
+                        future.result()
+                    while not progress_queue.empty():
+                        written += progress_queue.get()
+                    print(f"画像読み込み: {written}/{total_images} ({written / total_images * 100:.2f}%), "
+                          f"セグメント {segments - len(pending)}/{segments} 完了")
+            concat_segments(segment_paths, save_path)
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+        return
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # MP4形式
+    video_writer = cv2.VideoWriter(save_path, fourcc, fps, (width, height))
+    if first_image is not None:
+        # 最初の画像は読み込み済みなので、2枚目以降を先読みする
+        frames = itertools.chain([(image_paths[0], first_image)], prefetch_images(image_paths[1:], read_func))
+    else:
+        frames = prefetch_images(image_paths, read_func)
+    last_report = 0
+
+    def progress(index):
+        nonlocal last_report
+        now = time.perf_counter()
+        if now - last_report >= REPORT_INTERVAL or index == total_images:
+            last_report = now
+            print(f"画像読み込み: {index}/{total_images} ({index / total_images * 100:.2f}%)")
+
+    write_frames(video_writer, frames, repeats, width, height, fit, progress)
+    video_writer.release()
+
 def create_video_from_bmp():
     # Tkinterの初期化
     root = Tk()
@@ -69,7 +448,7 @@ def create_video_from_bmp():
     script_path = os.path.abspath(__file__)
 
     # フォルダ選択ダイアログ
-    folder_path = filedialog.askdirectory(title="BMPファイルが格納されたフォルダを選択してください")
+    folder_path = filedialog.askdirectory(title="画像ファイル (BMP/PNG/TIFF/JPEG) が格納されたフォルダを選択してください")
     if not folder_path:
         print("フォルダが選択されませんでした。終了します。")
         return
@@ -80,24 +459,27 @@ def create_video_from_bmp():
         print("画像表示時間が指定されませんでした。終了します。")
         return
 
-    # フォルダがNAS上にある場合、一時フォルダにコピー
+    # フォルダがNAS上にある場合、直接読み込みながらエンコードする (NAS_MODE = 'copy' なら一時フォルダにコピー)
     temp_folder = None
+    read_func = cv2.imread
     if is_nas_path(script_path, folder_path):
-        print("指定されたフォルダはNAS上にあると判定されました。一時フォルダにコピーします...")
-        temp_folder = copy_folder_to_temp(folder_path)
-        folder_path = temp_folder
+        if NAS_MODE == 'copy':
+            print("指定されたフォルダはNAS上にあると判定されました。一時フォルダにコピーします...")
+            temp_folder = copy_folder_to_temp(folder_path)
+            folder_path = temp_folder
+        else:
+            print("指定されたフォルダはNAS上にあると判定されました。NASから直接読み込みます...")
+            read_func = StreamingReader()
 
-    # フォルダ内のBMPファイルを取得
-    images = [f for f in os.listdir(folder_path) if f.lower().endswith('.bmp')]
+    # フォルダ内の画像ファイルを取得 (ファイル名の自然順、または SORT_PATTERN の連番順)
+    images = list_sequence(folder_path)
     if not images:
-        print("指定されたフォルダにBMPファイルがありません。終了します。")
+        print("指定されたフォルダに画像ファイルがありません。終了します。")
         return
 
-    images.sort()  # ファイル名順にソート（任意）
-
-    # 最初の画像を読み込み、解像度を取得
+    # 最初の画像を読み込み、解像度を取得 (異なる解像度の画像はこれに合わせる)
     first_image_path = os.path.join(folder_path, images[0])
-    first_image = cv2.imread(first_image_path)
+    first_image = read_func(first_image_path)
     height, width, _ = first_image.shape
 
     # 動画ファイルの保存パス
@@ -110,35 +492,24 @@ def create_video_from_bmp():
         print("保存先が指定されませんでした。終了します。")
         return
 
-    # 動画ファイルの設定
-    fps = int(1 / display_time)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # MP4形式
-    video_writer = cv2.VideoWriter(save_path, fourcc, fps, (width, height))
+    # 動画ファイルの設定 (表示時間が 1/整数 秒でない場合は画像を複製して合わせる)
+    fps = choose_fps(display_time)
+    repeats = compute_repeats(len(images), display_time, fps)
+    print(f"出力fps: {fps:g} (1枚あたり平均 {repeats.mean():.2f} フレーム)")
 
-    # BMP画像を動画に追加（進捗を表示）
+    # 画像を動画に追加（進捗を表示）
     total_images = len(images)
     print(f"全{total_images}枚の画像を処理します...")
 
-    for index, image_name in enumerate(images):
-        image_path = os.path.join(folder_path, image_name)
-        image = cv2.imread(image_path)
-        if image is None:
-            print(f"画像の読み込みに失敗しました: {image_path}")
-            continue
-
-        video_writer.write(image)
-
-        # 進捗状況を表示
-        print(f"BMP読み込み: {index + 1}/{total_images} ({(index + 1) / total_images * 100:.2f}%)")
-
-    video_writer.release()
+    image_paths = [os.path.join(folder_path, image_name) for image_name in images]
+    encode_sequence(image_paths, save_path, fps, repeats, width, height, read_func=read_func, first_image=first_image)
     print(f"動画が作成されました: {save_path}")
     print("処理が完了しました。")
 
-    # 一時フォルダの削除
+    # 一時フォルダの削除 (動画の作成に成功したときだけ。失敗時は次回の再開に使う)
     if temp_folder:
         print(f"一時フォルダを削除します: {temp_folder}")
-        shutil.rmtree(temp_folder)
+        shutil.rmtree(os.path.dirname(temp_folder))
 
 if __name__ == "__main__":
     create_video_from_bmp()
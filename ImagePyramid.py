@@ -0,0 +1,327 @@
+# 巨大な画像を表示するための多重解像度ピラミッドとタイル表示キャンバス
+# ColorPick.py と RGBPlot.py から共通で使う
+
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image, ImageTk
+
+TILE_SIZE = 256  # タイル1枚の大きさ (ピクセル)
+TILE_CACHE_BYTES = 256 * 1024 * 1024  # タイルキャッシュの上限
+BUILD_START_LEVEL = 3  # この縮小レベル以上をバックグラウンドで作成 (それ未満は原寸から都度計算)
+STRIP_ROWS = 512  # レベル作成時に一度に読む行数 (作成先のレベルでの行数)
+STRIP_BYTES = 64 * 1024 * 1024  # 最初のレベルの作成時に原寸から一度に読む帯の上限
+
+# 無圧縮データの画素の並び → (1画素のバイト数, R, G, B の位置)
+RAW_LAYOUTS = {
+    'RGB': (3, (0, 1, 2)),
+    'BGR': (3, (2, 1, 0)),
+    'RGBX': (4, (0, 1, 2)),
+    'RGBA': (4, (0, 1, 2)),
+    'BGRX': (4, (2, 1, 0)),
+    'BGRA': (4, (2, 1, 0)),
+    'L': (1, (0, 0, 0)),
+}
+
+# 数億画素の画像を扱うので、Pillowの巨大画像チェックは無効にする
+Image.MAX_IMAGE_PIXELS = None
+
+
+class ArraySource:
+    """
+    画素配列 (高さ, 幅, チャンネル) を画像ソースとして扱います。
+    order にはRGBの各チャンネルの位置を指定します (BGR の並びなら (2, 1, 0))。
+    配列は np.memmap でもよく、その場合は読み出した範囲だけがファイルから読まれます。
+    """
+    def __init__(self, array, order=(0, 1, 2)):
+        self.array = array
+        self.height, self.width = array.shape[:2]
+        self.order = None if tuple(order) == (0, 1, 2) and array.shape[2] >= 3 else list(order)
+
+    def read_region(self, x0, y0, x1, y1, step=1):
+        """原寸の範囲 [x0, x1) × [y0, y1) を step 画素おきに読み出します。"""
+        region = self.array[y0:y1:step, x0:x1:step]
+        return region[..., :3] if self.order is None else region[..., self.order]
+
+    def pixel(self, x, y):
+        value = self.array[y, x]
+        return tuple(int(value[c]) for c in (self.order or (0, 1, 2)))
+
+
+def map_raw_image(path):
+    """
+    無圧縮のBMP/TIFFや.npyをメモリマップし、ArraySource を返します。
+    画素データがファイル内で連続していない場合や圧縮されている場合は None
+    """
+    if path.lower().endswith('.npy'):
+        array = np.load(path, mmap_mode='r')
+        if array.dtype != np.uint8 or array.ndim != 3 or array.shape[2] not in (3, 4):
+            return None
+        return ArraySource(array)
+    # Image.open はヘッダーだけを読むので、画素データの位置と並びを tile から取り出す
+    with Image.open(path) as img:
+        width, height = img.size
+        tiles = sorted(img.tile, key=lambda tile: tile[1][1])
+    if not tiles or any(tile[0] != 'raw' or tile[1][0] != 0 or tile[1][2] != width for tile in tiles):
+        return None
+    args = tiles[0][3]
+    rawmode, stride, ystep = args if isinstance(args, tuple) else (args, 0, 1)
+    if rawmode not in RAW_LAYOUTS or any(tile[3] != tiles[0][3] for tile in tiles):
+        return None
+    channels, order = RAW_LAYOUTS[rawmode]
+    stride = stride or width * channels
+    # TIFFのストリップは隙間なく並んでいる場合だけ扱う
+    offset = tiles[0][2]
+    for tile in tiles:
+        if tile[2] != offset:
+            return None
+        offset += (tile[1][3] - tile[1][1]) * stride
+    if tiles[0][1][1] != 0 or tiles[-1][1][3] != height:
+        return None
+    rows = np.memmap(path, dtype=np.uint8, mode='r', offset=tiles[0][2], shape=(height, stride))
+    array = rows[:, :width * channels].reshape(height, width, channels)
+    if ystep < 0:
+        array = array[::-1]  # BMPは下の行から格納されている
+    return ArraySource(array, order)
+
+
+def open_image_source(path):
+    """
+    画像ファイルを画像ソースとして開きます。無圧縮ならメモリマップし、
+    それ以外は従来どおり全体をデコードします。
+    """
+    try:
+        source = map_raw_image(path)
+    except (OSError, ValueError):
+        source = None
+    if source is None:
+        with Image.open(path) as img:
+            source = ArraySource(np.asarray(img.convert('RGB')))
+    return source
+
+
+def downsample(region, factor):
+    """factor × factor 画素のブロック平均で縮小します (端の半端な画素は切り捨て)。"""
+    h = region.shape[0] // factor
+    w = region.shape[1] // factor
+    blocks = region[:h * factor, :w * factor].reshape(h, factor, w, factor, 3)
+    return blocks.mean(axis=(1, 3)).round().astype(np.uint8)
+
+
+class ImagePyramid:
+    """
+    画像ソースの多重解像度ピラミッドです。レベル k は原寸の 1/2^k です。
+    BUILD_START_LEVEL 以上のレベルはバックグラウンドスレッドで順に作成し、
+    作成前はそのレベルのタイルを原寸から間引いて代用します。タイルはLRUでキャッシュします。
+    """
+    def __init__(self, source, tile_size=TILE_SIZE, cache_bytes=TILE_CACHE_BYTES):
+        self.source = source
+        self.width = source.width
+        self.height = source.height
+        self.tile_size = tile_size
+        self.cache_bytes = cache_bytes
+        self.cache = OrderedDict()
+        self.cache_total = 0
+        self.lock = threading.Lock()
+        # タイル1枚に全体が収まるレベルまで作る
+        self.max_level = max(0, math.ceil(math.log2(max(self.width, self.height) / tile_size)))
+        self.levels = {}  # 作成済みのレベル → 配列
+        self.stopped = threading.Event()
+        self.updated = threading.Event()  # 新しいレベルができたら立てる (表示側が確認して再描画)
+        self.thread = threading.Thread(target=self._build_levels, daemon=True)
+        self.thread.start()
+
+    def level_size(self, level):
+        return max(1, self.width >> level), max(1, self.height >> level)
+
+    def _build_levels(self):
+        factor = 2 ** BUILD_START_LEVEL
+        previous = None
+        for level in range(BUILD_START_LEVEL, self.max_level + 1):
+            width, height = self.level_size(level)
+            array = np.empty((height, width, 3), dtype=np.uint8)
+            strip = STRIP_ROWS
+            if previous is None:
+                # 原寸の帯 (strip * factor 行 × 全幅) が STRIP_BYTES に収まる行数にする
+                strip = max(1, min(STRIP_ROWS, STRIP_BYTES // (width * factor * 3 * factor)))
+            for row in range(0, height, strip):
+                if self.stopped.is_set():
+                    return
+                rows = min(strip, height - row)
+                if previous is None:
+                    # 最初のレベルは原寸から帯状に読んで縮小する
+                    region = self.source.read_region(0, row * factor, width * factor, (row + rows) * factor)
+                    array[row:row + rows] = downsample(region, factor)
+                else:
+                    region = previous[row * 2:(row + rows) * 2, :width * 2]
+                    array[row:row + rows] = downsample(region, 2)
+            with self.lock:
+                self.levels[level] = array
+                # 間引きで代用していたタイルを捨てる
+                for key in [key for key in self.cache if key[0] == level]:
+                    self.cache_total -= self.cache.pop(key).nbytes
+            previous = array
+            self.updated.set()
+
+    def tile(self, level, tx, ty):
+        """レベル level のタイル (tx, ty) をRGB配列で返します。"""
+        key = (level, tx, ty)
+        with self.lock:
+            tile = self.cache.get(key)
+            if tile is not None:
+                self.cache.move_to_end(key)
+                return tile
+            built = self.levels.get(level)
+        size = self.tile_size
+        width, height = self.level_size(level)
+        x0, y0 = tx * size, ty * size
+        x1, y1 = min(x0 + size, width), min(y0 + size, height)
+        if built is not None:
+            tile = built[y0:y1, x0:x1]
+        elif level < BUILD_START_LEVEL:
+            # 低いレベルは原寸から読んでブロック平均で縮小する
+            factor = 2 ** level
+            region = self.source.read_region(x0 * factor, y0 * factor, x1 * factor, y1 * factor)
+            tile = region if factor == 1 else downsample(region, factor)
+        else:
+            # まだ作成されていないレベルは原寸から間引いて代用する
+            factor = 2 ** level
+            region = self.source.read_region(x0 * factor, y0 * factor, x1 * factor, y1 * factor, step=factor)
+            tile = region[:y1 - y0, :x1 - x0]
+        tile = np.ascontiguousarray(tile)
+        with self.lock:
+            if key not in self.cache and tile.nbytes <= self.cache_bytes:
+                self.cache[key] = tile
+                self.cache_total += tile.nbytes
+                while self.cache_total > self.cache_bytes:
+                    self.cache_total -= self.cache.popitem(last=False)[1].nbytes
+        return tile
+
+    def pixel(self, x, y):
+        """原寸の画素値を返します。"""
+        return self.source.pixel(x, y)
+
+    def close(self):
+        self.stopped.set()
+
+
+class PyramidCanvas:
+    """
+    ImagePyramid を tk.Canvas に表示します。表示範囲のタイルだけを読み込み、
+    マウスホイールで拡大・縮小、右ボタン (または中ボタン) のドラッグで移動できます。
+    on_render(view) は再描画のたびに呼ばれ、線などの重ね描きに使えます。
+    """
+    def __init__(self, canvas, width, height, on_render=None, allow_upscale=True):
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.on_render = on_render
+        self.allow_upscale = allow_upscale
+        self.pyramid = None
+        self.zoom = 1.0  # 表示画素 / 原寸画素
+        self.origin = (0.0, 0.0)  # キャンバス左上に対応する原寸座標
+        self.photos = {}
+        self.drag_start = None
+        for button in ('2', '3'):
+            canvas.bind(f'<ButtonPress-{button}>', self._start_drag)
+            canvas.bind(f'<B{button}-Motion>', self._drag)
+        canvas.bind('<MouseWheel>', self._wheel)
+        canvas.bind('<Button-4>', self._wheel)
+        canvas.bind('<Button-5>', self._wheel)
+        self._poll()
+
+    def set_pyramid(self, pyramid):
+        """表示する画像を切り替え、キャンバスに収まる倍率で中央に表示します。"""
+        if self.pyramid is not None:
+            self.pyramid.close()
+        self.pyramid = pyramid
+        zoom = min(self.width / pyramid.width, self.height / pyramid.height)
+        self.zoom = zoom if self.allow_upscale else min(zoom, 1.0)
+        self.origin = (
+            (pyramid.width - self.width / self.zoom) / 2,
+            (pyramid.height - self.height / self.zoom) / 2,
+        )
+        self.render()
+
+    def canvas_to_image(self, x, y):
+        """キャンバス座標を原寸の画像座標に変換します。画像外なら (None, None)"""
+        if self.pyramid is None:
+            return None, None
+        img_x = int(self.origin[0] + x / self.zoom)
+        img_y = int(self.origin[1] + y / self.zoom)
+        if 0 <= img_x < self.pyramid.width and 0 <= img_y < self.pyramid.height:
+            return img_x, img_y
+        return None, None
+
+    def image_to_canvas(self, x, y):
+        return (x - self.origin[0]) * self.zoom, (y - self.origin[1]) * self.zoom
+
+    def render(self):
+        """表示範囲にかかるタイルだけを選んだレベルから読み込んで描画します。"""
+        self.canvas.delete('tile')
+        if self.pyramid is None:
+            return
+        pyramid = self.pyramid
+        # 1表示画素が1画素以上になる最も粗いレベルを選ぶ
+        level = max(0, min(pyramid.max_level, int(math.floor(math.log2(1 / self.zoom))))) if self.zoom < 1 else 0
+        scale = 2 ** level
+        tile_span = pyramid.tile_size * scale  # タイル1枚が覆う原寸の幅
+        level_w, level_h = pyramid.level_size(level)
+        tx0 = max(0, int(self.origin[0] // tile_span))
+        ty0 = max(0, int(self.origin[1] // tile_span))
+        tx1 = min(-(-level_w // pyramid.tile_size), int((self.origin[0] + self.width / self.zoom) // tile_span) + 1)
+        ty1 = min(-(-level_h // pyramid.tile_size), int((self.origin[1] + self.height / self.zoom) // tile_span) + 1)
+        photos = {}
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                tile = pyramid.tile(level, tx, ty)
+                # 拡大表示で画面からはみ出す部分は切り取ってから拡大する
+                x0 = max(0, int((self.origin[0] - tx * tile_span) // scale))
+                y0 = max(0, int((self.origin[1] - ty * tile_span) // scale))
+                x1 = min(tile.shape[1], int(-(-(self.origin[0] + self.width / self.zoom - tx * tile_span) // scale)) + 1)
+                y1 = min(tile.shape[0], int(-(-(self.origin[1] + self.height / self.zoom - ty * tile_span) // scale)) + 1)
+                tile = tile[y0:y1, x0:x1]
+                left, top = self.image_to_canvas(tx * tile_span + x0 * scale, ty * tile_span + y0 * scale)
+                right, bottom = self.image_to_canvas(tx * tile_span + x1 * scale, ty * tile_span + y1 * scale)
+                size = (max(1, round(right) - round(left)), max(1, round(bottom) - round(top)))
+                image = Image.fromarray(tile)
+                if image.size != size:
+                    image = image.resize(size, Image.Resampling.BILINEAR)
+                photo = ImageTk.PhotoImage(image)
+                photos[(tx, ty)] = photo
+                self.canvas.create_image(round(left), round(top), anchor='nw', image=photo, tags='tile')
+        self.photos = photos  # 表示中のタイルの参照を保持
+        self.canvas.tag_lower('tile')
+        if self.on_render is not None:
+            self.on_render(self)
+
+    def _poll(self):
+        # バックグラウンドでレベルが作成されたら描き直す
+        if self.pyramid is not None and self.pyramid.updated.is_set():
+            self.pyramid.updated.clear()
+            self.render()
+        self.canvas.after(200, self._poll)
+
+    def _start_drag(self, event):
+        self.drag_start = (event.x, event.y, self.origin)
+
+    def _drag(self, event):
+        if self.drag_start is None:
+            return
+        x, y, (ox, oy) = self.drag_start
+        self.origin = (ox - (event.x - x) / self.zoom, oy - (event.y - y) / self.zoom)
+        self.render()
+
+    def _wheel(self, event):
+        if self.pyramid is None:
+            return
+        zoom_in = event.num == 4 or getattr(event, 'delta', 0) > 0
+        factor = 1.25 if zoom_in else 0.8
+        # カーソル位置の画素が動かないように拡大・縮小する
+        img_x = self.origin[0] + event.x / self.zoom
+        img_y = self.origin[1] + event.y / self.zoom
+        fit = min(self.width / self.pyramid.width, self.height / self.pyramid.height)
+        self.zoom = min(max(self.zoom * factor, fit / 4), 32.0)
+        self.origin = (img_x - event.x / self.zoom, img_y - event.y / self.zoom)
+        self.render()
@@ -1,48 +1,126 @@
 import re
 import json
-from geopy.geocoders import GoogleV3
+import argparse
+from itertools import islice
+from geocode import CachedGeocoder, GEOCODERS, make_geocoder
 from params import Params
 
+CHUNK_SIZE = 1 << 16  # 一度に読む文字数
+BATCH_SIZE = 1000  # まとめてジオコードする施設の数
 
-geolocator = GoogleV3(Params.API_KEY)
+# 1行 (<tr>〜</tr>) が1施設
+ROW_PATTERN = re.compile(r"<tr\b.*?</tr\s*>", re.S)
 
-def parse_facility_block(block):
-    # 施設名
-    name = re.search(r"<span class='nm'>(.*?)</span>", block)
-    name = name.group(1) if name else None
+# 施設名・種別・料金・設備/泉質・住所を1回の走査で拾う
+FIELD_PATTERN = re.compile(
+    r"<span\s+class=['\"]nm['\"]\s*>(?P<name>.*?)</span>"
+    r"|<td\s+class=['\"]tp\s*\{sortValue:(?P<type>\d+)\}['\"]"
+    r"|<td\s+class=['\"]pr[^'\"]*['\"]\s*>(?P<fee>[^<]*)</td>"
+    r"|<div\s+class=['\"]flag\s+(?P<flag>[^'\"]*)['\"]\s*>(?P<flag_text>.*?)</div>"
+    r"|<td\s+class=['\"]ad['\"][^>]*>\s*<a\s+href=['\"][^'\"]*['\"]\s*>(?P<city>.*?)</a>(?P<street>[^<]*)",
+    re.S,
+)
+SPRING_FLAGS = {"enka", "tanjun", "tansan", "ryusan", "nisan"}
 
-    # 住所（市町村＋番地）
-    address = re.search(r"<a href='[^']*'>(.*?)</a>([^<]*)", block)
-    city = "石川県" + address.group(1) if address else None
-    full_address = city + address.group(2).strip() if address else None
-    location = geolocator.geocode(full_address) if full_address else None
-    print(city, location)
-    latitude = location.latitude if location else None
-    longitude = location.longitude if location else None
 
-    # 設備
-    features = re.findall(r"<div class='flag (?!flag_off)[^']*'>(.*?)</div>", block)
+def iter_rows(f, chunk_size=CHUNK_SIZE):
+    """
+    ファイルを少しずつ読み、<tr>〜</tr> を1つずつ返すジェネレーター。
+    手元に残すのは読みかけの1行分だけなので、入力の大きさによらずメモリは一定。
+    """
+    buffer = ""
+    while True:
+        chunk = f.read(chunk_size)
+        buffer += chunk
+        end = 0
+        for match in ROW_PATTERN.finditer(buffer):
+            yield match.group(0)
+            end = match.end()
+        buffer = buffer[end:]
+        if not chunk:
+            break
+        # 行の外の部分は捨て、読みかけの行だけを残す
+        start = buffer.rfind("<tr")
+        buffer = buffer[start:] if start >= 0 else buffer[-2:]
 
-    # 泉質
-    spring_types = re.findall(r"<div class='flag (enka|tanjun|tansan|ryusan|nisan)'>(.*?)</div>", block)
-    spring_types = [t[1] for t in spring_types]
 
-    return {
-        "name": name,
-        "latitude": latitude,
-        "longitude": longitude,
-        "features": features,
-        "spring_types": spring_types,
+def parse_fee(text):
+    """'¥1,000' → 1000, '無料' → 0, それ以外 (要確認など) → None"""
+    text = text.strip()
+    if text == "無料":
+        return 0
+    digits = re.sub(r"[^\d]", "", text)
+    return int(digits) if digits else None
+
+
+def parse_facility_row(row):
+    """1施設の行から項目を取り出す。施設名のない行 (見出しなど) は None"""
+    record = {
+        "name": None,
+        "address": None,
+        "type": None,
+        "fee": None,
+        "features": [],
+        "spring_types": [],
     }
+    for match in FIELD_PATTERN.finditer(row):
+        kind = match.lastgroup
+        if kind == "name":
+            record["name"] = match.group("name")
+        elif kind == "type":
+            record["type"] = int(match.group("type"))
+        elif kind == "fee":
+            record["fee"] = parse_fee(match.group("fee"))
+        elif kind == "flag_text":
+            flag = match.group("flag")
+            # 設備 (flag_off 以外。泉質も含む)
+            if not flag.startswith("flag_off"):
+                record["features"].append(match.group("flag_text"))
+            # 泉質
+            if flag in SPRING_FLAGS:
+                record["spring_types"].append(match.group("flag_text"))
+        elif kind == "street" and record["address"] is None:
+            # 住所（市町村＋番地）
+            record["address"] = "石川県" + match.group("city") + match.group("street").strip()
+    return record if record["name"] is not None else None
+
+
+def iter_records(f):
+    for row in iter_rows(f):
+        record = parse_facility_row(row)
+        if record is not None:
+            yield record
+
+
+def batched(iterable, n):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, n)):
+        yield batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="施設一覧のHTMLをジオコードして JSON Lines に保存する")
+    parser.add_argument("input", nargs="?", default="Data.txt")
+    parser.add_argument("output", nargs="?", help=f"出力先 (既定は {Params.DATA_PATH}、fake なら {Params.FAKE_DATA_PATH})")
+    parser.add_argument("--offline", action="store_true", help="ジオコーダーに問い合わせずキャッシュだけを使う")
+    parser.add_argument("--geocoder", choices=sorted(GEOCODERS), default=Params.GEOCODER)
+    args = parser.parse_args()
+    if args.output is None:
+        # fake の座標が学習データ (DATA_PATH) に混ざらないように別のファイルに書く
+        args.output = Params.FAKE_DATA_PATH if args.geocoder == "fake" else Params.DATA_PATH
 
-# ファイル読み込み
-with open('Data.txt', encoding='utf-8') as f:
-    text = f.read()
+    # 同じ住所は前回の結果をキャッシュから使う
+    geolocator = CachedGeocoder(None if args.offline else make_geocoder(args.geocoder), offline=args.offline, backend=args.geocoder)
 
-# 施設ごとに分割
-blocks = re.split(r"</tr><tr", text)
-data_list = [parse_facility_block(block) for block in blocks if block.strip()]
+    count = 0
+    with open(args.input, encoding="utf-8") as f, open(args.output, "w", encoding="utf-8") as out:
+        # BATCH_SIZE 件ずつ読んでは、キャッシュにない住所をまとめてジオコードして書き出す
+        for batch in batched(iter_records(f), BATCH_SIZE):
+            locations = geolocator.geocode_many([record["address"] for record in batch])
+            for record, location in zip(batch, locations):
+                record["latitude"], record["longitude"] = location if location else (None, None)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += len(batch)
 
-# JSON保存
-with open('Data.json', 'w', encoding='utf-8') as f:
-    json.dump(data_list, f, ensure_ascii=False, indent=2)
+    print(f"{count}件を {args.output} に保存しました")
+    print(f"ジオコーダーへの問い合わせ: {geolocator.calls}件")
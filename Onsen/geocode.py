@@ -0,0 +1,205 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from params import Params
+
+DAY = 24 * 60 * 60
+
+
+def normalize_address(address):
+    """全角・半角や空白の違いを吸収したキャッシュのキー"""
+    return ''.join(unicodedata.normalize('NFKC', address).split())
+
+
+class GoogleGeocoder:
+    """GoogleV3 (従量課金) でジオコードする"""
+    def __init__(self, api_key=Params.API_KEY):
+        from geopy.geocoders import GoogleV3  # 使うときだけ読み込む
+        self.geolocator = GoogleV3(api_key)
+
+    def geocode(self, address):
+        location = self.geolocator.geocode(address)
+        return (location.latitude, location.longitude) if location else None
+
+
+class FakeGeocoder:
+    """
+    ネットワークを使わないテスト用の代用品。住所のハッシュから地図の範囲内の座標を決めて返す。
+    calls に呼び出し回数を数える。
+    """
+    def __init__(self, north=37.54, east=137.36, south=36.13, west=136.03):
+        self.bounds = (north, east, south, west)
+        self.calls = 0
+
+    def geocode(self, address):
+        self.calls += 1
+        digest = hashlib.sha1(address.encode('utf-8')).digest()
+        north, east, south, west = self.bounds
+        lat = south + (north - south) * int.from_bytes(digest[:4], 'big') / 2 ** 32
+        lon = west + (east - west) * int.from_bytes(digest[4:8], 'big') / 2 ** 32
+        return lat, lon
+
+
+GEOCODERS = {
+    'google': GoogleGeocoder,
+    'fake': FakeGeocoder,
+}
+
+
+def make_geocoder(name=Params.GEOCODER):
+    if name not in GEOCODERS:
+        raise ValueError(f"不明なジオコーダー: {name} ({', '.join(GEOCODERS)})")
+    return GEOCODERS[name]()
+
+
+class GeocodeCache:
+    """
+    ジオコーダーの名前と正規化した住所をキーにジオコード結果をSQLiteに保存する。
+    ジオコーダーごとに別のキーになるので、fake の座標を google の結果として使うことはない。
+    見つからなかった住所も保存し (negative cache)、それぞれ期限が切れるまで使う。
+    """
+    def __init__(self, path=Params.GEOCODE_CACHE, backend=Params.GEOCODER, ttl=Params.GEOCODE_TTL_DAYS * DAY, negative_ttl=Params.GEOCODE_NEGATIVE_TTL_DAYS * DAY):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "key TEXT PRIMARY KEY, address TEXT, latitude REAL, longitude REAL, updated REAL)"
+        )
+
+    def key(self, address):
+        return f"{self.backend}:{normalize_address(address)}"
+
+    def get(self, address):
+        """(見つかったか, (緯度, 経度) または None) を返す。期限切れや未登録なら (False, None)"""
+        row = self.db.execute(
+            "SELECT latitude, longitude, updated FROM geocode WHERE key = ?", (self.key(address),)
+        ).fetchone()
+        if row is None:
+            return False, None
+        latitude, longitude, updated = row
+        location = None if latitude is None else (latitude, longitude)
+        ttl = self.ttl if location else self.negative_ttl
+        if time.time() - updated > ttl:
+            return False, None
+        return True, location
+
+    def put(self, address, location, commit=True):
+        latitude, longitude = location if location else (None, None)
+        self.db.execute(
+            "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)",
+            (self.key(address), address, latitude, longitude, time.time()),
+        )
+        if commit:
+            self.db.commit()
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+class TokenBucket:
+    """1秒あたり rate 回 (最大 burst 回まで連続) に呼び出しを制限する"""
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CachedGeocoder:
+    """
+    キャッシュを先に引き、なければ geocoder に問い合わせて保存する。
+    backend はジオコーダーの名前 (GEOCODERS のキー) で、キャッシュもこの名前の結果だけを使う。
+    offline=True のときは問い合わせずにキャッシュだけを使う。
+    """
+    def __init__(self, geocoder=None, cache=None, offline=False, backend=Params.GEOCODER):
+        self.geocoder = geocoder
+        self.backend = backend
+        self.cache = cache if cache is not None else GeocodeCache(backend=backend)
+        self.offline = offline
+        self.calls = 0  # 実際に問い合わせた回数
+
+    def geocode(self, address):
+        hit, location = self.cache.get(address)
+        if hit or self.offline:
+            return location
+        if self.geocoder is None:
+            self.geocoder = make_geocoder(self.backend)
+        self.calls += 1
+        location = self.geocoder.geocode(address)
+        self.cache.put(address, location)
+        return location
+
+    def _geocode_with_retry(self, address, bucket, retries, backoff):
+        for attempt in range(retries + 1):
+            bucket.acquire()
+            try:
+                return self.geocoder.geocode(address)
+            except Exception as e:  # 通信エラーやレート超過は待ってからやり直す
+                if attempt == retries:
+                    raise
+                print(f"ジオコードを再試行します ({attempt + 1}/{retries}): {address}: {e}")
+                time.sleep(backoff * 2 ** attempt)
+
+    def geocode_many(self, addresses, workers=Params.GEOCODE_WORKERS, qps=Params.GEOCODE_QPS, retries=Params.GEOCODE_RETRIES, backoff=Params.GEOCODE_BACKOFF):
+        """
+        住所のリストをまとめてジオコードし、同じ順番で結果を返す (住所が None なら None)。
+        キャッシュにない住所だけを重複を除いて workers 本のスレッドで問い合わせ、
+        全体で毎秒 qps 回までに抑える。再試行しても失敗した住所は None のままキャッシュしない。
+        """
+        results = {}
+        misses = {}
+        for address in addresses:
+            if address is None:
+                continue
+            key = normalize_address(address)
+            if key in results or key in misses:
+                continue
+            hit, location = self.cache.get(address)
+            if hit or self.offline:
+                results[key] = location
+            else:
+                misses[key] = address
+        if misses:
+            if self.geocoder is None:
+                self.geocoder = make_geocoder(self.backend)
+            bucket = TokenBucket(qps, burst=max(1, min(workers, int(qps))))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._geocode_with_retry, address, bucket, retries, backoff): key
+                    for key, address in misses.items()
+                }
+                # キャッシュへの書き込みはこのスレッドだけで行う
+                for future in as_completed(futures):
+                    key = futures[future]
+                    self.calls += 1
+                    try:
+                        location = future.result()
+                    except Exception as e:
+                        print(f"ジオコードに失敗しました: {misses[key]}: {e}")
+                        results[key] = None
+                        continue
+                    results[key] = location
+                    self.cache.put(misses[key], location, commit=False)
+            self.cache.commit()
+        return [None if address is None else results[normalize_address(address)] for address in addresses]
@@ -0,0 +1,49 @@
+import numpy as np
+from PIL import Image
+
+MAP_NE = [37.54, 137.36]
+MAP_SW = [36.13, 136.03]
+OUTSIDE = -1  # 地図の範囲外 (またはジオコードできなかった地点) の地質タイプ
+
+
+def pack_colors(rgb):
+    """RGB配列 (..., 3) を 0xRRGGBB の整数に詰める"""
+    rgb = np.asarray(rgb, dtype=np.uint32)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def latlon_to_xy(lat, lon, lat_ne, lon_ne, lat_sw, lon_sw, width, height):
+    """緯度・経度の配列を画素座標の配列に変換する (int() と同じく0方向に切り捨て)"""
+    x = (np.asarray(lon, dtype=np.float64) - lon_sw) / (lon_ne - lon_sw) * width
+    y = (lat_ne - np.asarray(lat, dtype=np.float64)) / (lat_ne - lat_sw) * height
+    return np.trunc(x), np.trunc(y)
+
+
+class GeologyMap:
+    """
+    地質図 (map.png) を一度だけ読み込み、色ごとに整数の地質タイプを割り当てた配列を作る。
+    palette には地質タイプ番号順の色 (0xRRGGBB) を渡すと同じ番号を使い、
+    地図にしかない色は辞書で新しい番号を後ろに追加する。
+    """
+    def __init__(self, path='map.png', ne=MAP_NE, sw=MAP_SW, palette=None):
+        self.ne = ne
+        self.sw = sw
+        rgb = np.asarray(Image.open(path).convert('RGB'))
+        self.height, self.width = rgb.shape[:2]
+        colors, inverse = np.unique(pack_colors(rgb).ravel(), return_inverse=True)
+        self.palette = [int(c) for c in palette] if palette is not None else []
+        index = {color: i for i, color in enumerate(self.palette)}
+        for color in colors.tolist():
+            if color not in index:
+                index[color] = len(self.palette)
+                self.palette.append(color)
+        lut = np.array([index[color] for color in colors.tolist()], dtype=np.int32)
+        self.labels = lut[inverse].reshape(self.height, self.width)
+
+    def classify(self, lat, lon):
+        """緯度・経度の配列の地質タイプを配列で返す。範囲外は OUTSIDE"""
+        x, y = latlon_to_xy(lat, lon, self.ne[0], self.ne[1], self.sw[0], self.sw[1], self.width, self.height)
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)  # NaN は False になる
+        result = np.full(x.shape, OUTSIDE, dtype=np.int32)
+        result[inside] = self.labels[y[inside].astype(np.intp), x[inside].astype(np.intp)]
+        return result
@@ -0,0 +1,47 @@
+import time
+import numpy as np
+import pandas as pd
+from PIL import Image
+from geology import MAP_NE, MAP_SW
+
+
+def grid_coordinates(rows, cols, ne=MAP_NE, sw=MAP_SW):
+    """地図の範囲を rows × cols に分けた各マスの中心の緯度 (行ごと) と経度 (列ごと)"""
+    lat = ne[0] - (np.arange(rows) + 0.5) / rows * (ne[0] - sw[0])
+    lon = sw[1] + (np.arange(cols) + 0.5) / cols * (ne[1] - sw[1])
+    return lat, lon
+
+
+def predict_heatmap(model, geology, rows, cols, batch_size=200000, n_jobs=-1):
+    """
+    地図全体の格子で温泉が存在する確率を求め、(rows, cols) の float32 配列で返す。
+    一度に予測するのは batch_size 点までなので、格子を細かくしてもメモリは増えない。
+    ランダムフォレストの予測は n_jobs 本で並列に行う。
+    """
+    model.set_params(rf__n_jobs=n_jobs)
+    lat, lon = grid_coordinates(rows, cols, geology.ne, geology.sw)
+    proba = np.empty(rows * cols, dtype=np.float32)
+    batch_rows = max(1, batch_size // cols)
+    start = time.perf_counter()
+    for row in range(0, rows, batch_rows):
+        lat_batch = np.repeat(lat[row:row + batch_rows], cols)
+        lon_batch = np.tile(lon, len(lat_batch) // cols)
+        batch = pd.DataFrame({
+            'latitude': lat_batch,
+            'longitude': lon_batch,
+            'geology_type': geology.classify(lat_batch, lon_batch),
+        })
+        proba[row * cols:row * cols + len(batch)] = model.predict_proba(batch)[:, 1]
+        print(f"進行度: {min(row + batch_rows, rows)}/{rows}行 ({time.perf_counter() - start:.1f}秒)")
+    return proba.reshape(rows, cols)
+
+
+def save_heatmap(proba, npy_path, image_path, map_path='map.png', alpha=0.5):
+    """確率の配列を .npy で保存し、地質図に色を重ねた画像も保存する"""
+    from matplotlib import colormaps
+    np.save(npy_path, proba)
+    rows, cols = proba.shape
+    background = np.asarray(Image.open(map_path).convert('RGB').resize((cols, rows), Image.Resampling.BILINEAR), dtype=np.float32)
+    heat = colormaps['jet'](proba)[..., :3] * 255
+    overlay = background * (1 - alpha) + heat * alpha
+    Image.fromarray(overlay.round().astype(np.uint8)).save(image_path)
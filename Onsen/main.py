@@ -1,119 +1,216 @@
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
 import json
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.pipeline import Pipeline
-from PIL import Image
+import os
+import sys
+import time
+import numpy as np
 from params import Params
-from geopy.geocoders import GoogleV3
-
-MAP_NE = [37.54, 137.36]
-MAP_SW = [36.13, 136.03]
-
-geolocator = GoogleV3(Params.API_KEY)
-geology_types = []
-img = Image.open('map.png').convert('RGB')
-width, height = img.size
-pixels = img.load()
-
-class OnsenData:
-    name: str
-    latitude: float
-    longitude: float
-    is_natural: bool
-    geology_type: int
-    spring_types: list[str]
 
-onsen_list: list[OnsenData] = []
-
-def latlon_to_xy(lat, lon, lat_ne, lon_ne, lat_sw, lon_sw, width, height):
-    x = (lon - lon_sw) / (lon_ne - lon_sw) * width
-    y = (lat_ne - lat) / (lat_ne - lat_sw) * height
-    return int(x), int(y)
-
-def get_or_append_index(lst, value):
+# 重いライブラリ (pandas, scikit-learn, matplotlib) は使うサブコマンドの中で読み込む
+
+
+def load_predictor(path):
+    """保存したモデルを読み込む。なければ学習して保存する"""
+    from model import Predictor, train
+    if not os.path.exists(path):
+        print(f"{path} がないので学習します")
+        train(output=path)
+    start = time.perf_counter()
+    predictor = Predictor(path)
+    print(f"モデルの読み込み: {time.perf_counter() - start:.2f}秒", file=sys.stderr)
+    if predictor.is_stale():
+        print("学習後にデータか地質図かパラメーターが変わっています。train で作り直してください", file=sys.stderr)
+    return predictor
+
+
+def parse_points(values):
+    """'緯度 経度' や '緯度,経度' の並びを (緯度のリスト, 経度のリスト) にする"""
+    numbers = [float(v) for value in values for v in value.replace(',', ' ').split()]
+    if len(numbers) % 2:
+        raise ValueError("緯度と経度を組にして指定してください")
+    return numbers[0::2], numbers[1::2]
+
+
+def command_train(args):
+    from model import train
+    train(args.data, args.map, args.model)
+
+
+def command_predict(args):
+    predictor = load_predictor(args.model)
+    if args.stdin:
+        # 1行に '緯度 経度' を読むたびに答える (モデルは読み込んだまま)
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                lat, lon = parse_points([line])
+            except ValueError as e:
+                print(f"エラー: {e}", flush=True)
+                continue
+            for a, b, p in zip(lat, lon, predictor.predict(lat, lon)):
+                print(f"{a} {b} {p:.6f}", flush=True)
+        return
     try:
-        return lst.index(value)
-    except ValueError:
-        lst.append(value)
-        return len(lst) - 1
-
-with open('Data.json', encoding='utf-8') as f:
-    data = json.load(f)
-
-for item in data:
-    onsen = OnsenData()
-    onsen.name = item['name']
-    onsen.latitude = item['latitude']
-    onsen.longitude = item['longitude']
-    onsen.spring_types = item['spring_types']
-    onsen.is_natural = '天然温泉' in item['features']
-    onsen.geology_type = -1
-    onsen_list.append(onsen)
-
-print(f"Total: {len(onsen_list)}")
-
-for onsen in onsen_list:
-    x, y = latlon_to_xy(onsen.latitude, onsen.longitude, MAP_NE[0], MAP_NE[1], MAP_SW[0], MAP_SW[1], width, height)
-    if 0 <= x < width and 0 <= y < height:
-        color = pixels[x, y]
-        onsen.geology_type = get_or_append_index(geology_types, color)
-        #print(f"{onsen.name} 地質タイプ: {onsen.geology_type}")
+        lat, lon = parse_points(args.points)
+    except ValueError as e:
+        args.parser.error(str(e))
+    addresses = args.address or ([] if lat else [Params.SAMPLE_ADDRESS])
+    if addresses:
+        from geocode import CachedGeocoder
+        for address, location in zip(addresses, CachedGeocoder().geocode_many(addresses)):
+            if location is None:
+                print(f"{address} のジオコードに失敗しました")
+                continue
+            lat.append(location[0])
+            lon.append(location[1])
+    if not lat:
+        print("サンプル地点のジオコードに失敗しました")
+        return
+    proba = predictor.predict(lat, lon)
+    if len(proba) == 1:
+        print("予測された温泉存在確率:", proba[0])
     else:
-        #print(f"{onsen.name} 画像範囲外")
-        continue
-
-data = pd.DataFrame([{
-    'latitude': onsen.latitude,
-    'longitude': onsen.longitude,
-    'is_natural': onsen.is_natural,
-    'geology_type': onsen.geology_type,
-    'spring_types': ','.join(onsen.spring_types)
-} for onsen in onsen_list])
-
-X = data[['latitude', 'longitude', 'geology_type']]
-y = data["is_natural"].astype(int)
-
-categorical_features = ["geology_type"]
-numeric_features = ["latitude", "longitude"]
-
-preprocess = ColumnTransformer(
-    transformers=[
-        ("cat", OneHotEncoder(), categorical_features),
-        ("num", "passthrough", numeric_features)
-    ]
-)
-
-model = Pipeline(steps=[
-    ("preprocess", preprocess),
-    ("rf", RandomForestClassifier(
-        n_estimators=Params.N_ESTIMATORS,
-        max_depth=Params.MAX_DEPTH,
-        random_state=Params.RANDOM_STATE
-    ))
-])
-
-model.fit(X, y)
-
-sample_location = geolocator.geocode("金沢駅")
-if sample_location is None:
-    print("サンプル地点のジオコードに失敗しました")
-    exit()
-sample_geo_type = -1
-sample_x, sample_y = latlon_to_xy(sample_location.latitude, sample_location.longitude, MAP_NE[0], MAP_NE[1], MAP_SW[0], MAP_SW[1], width, height)
-if 0 <= sample_x < width and 0 <= sample_y < height:
-    sample_color = pixels[sample_x, sample_y]
-    sample_geo_type = get_or_append_index(geology_types, sample_color)
-sample = pd.DataFrame([{
-    'latitude': sample_location.latitude,
-    'longitude': sample_location.longitude,
-    'geology_type': sample_geo_type
-}])
-
-proba = model.predict_proba(sample)[0, 1]
-print("予測された温泉存在確率:", proba)
-
+        for a, b, p in zip(lat, lon, proba):
+            print(f"{a} {b} {p:.6f}")
+
+
+def command_heatmap(args):
+    from heatmap import predict_heatmap, save_heatmap
+    predictor = load_predictor(args.model)
+    proba = predict_heatmap(predictor.model, predictor.geology, args.rows, args.cols, args.batch_size, args.jobs)
+    save_heatmap(proba, args.output + ".npy", args.output + ".png", predictor.artifact['map_path'])
+    print(f"確率マップを {args.output}.npy と {args.output}.png に保存しました")
+
+
+def command_tune(args):
+    from geology import GeologyMap
+    from model import load_training_data, data_source
+    from tune import spatial_blocks, tune
+    X, y = load_training_data(GeologyMap(args.map), data_source(args.data))
+    groups = spatial_blocks(X['latitude'], X['longitude'], args.blocks)
+    start = time.perf_counter()
+    results, folds = tune(X, y, groups, Params.TUNE_GRID, args.folds, args.jobs, Params.RANDOM_STATE)
+    print(f"{len(X)}件, {len(np.unique(groups))}マスを{folds}分割して{len(results)}通りを評価 ({time.perf_counter() - start:.1f}秒)")
+    print(f"{'パラメーター':<40} {'正解率':>14} {'ROC-AUC':>8} {'学習(秒)':>9} {'予測(µs/点)':>12}")
+    for result in results:
+        params = ', '.join(f"{key}={value}" for key, value in result['params'].items())
+        print(f"{params:<40} {result['accuracy']:.3f} ± {result['accuracy_std']:.3f} {result['roc_auc']:>8.3f} "
+              f"{result['fit_time']:>9.3f} {result['predict_time'] * 1e6:>12.2f}")
+    if args.target is not None:
+        # 目標を満たす中で予測が最も速い (同じなら学習が速い) 候補
+        passed = [result for result in results if result[args.metric] >= args.target]
+        if not passed:
+            print(f"{args.metric} が {args.target} 以上の候補はありません")
+            return
+        best = min(passed, key=lambda result: (result['predict_time'], result['fit_time']))
+        print(f"{args.metric} >= {args.target} で最も軽い候補: {best['params']}")
+
+
+def command_serve(args):
+    """
+    モデルを読み込んだままHTTPで答える。
+      GET  /predict?lat=36.57&lon=136.65 (lat, lon は繰り返し可)
+      POST /predict {"points": [[36.57, 136.65], ...]}
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+    predictor = load_predictor(args.model)
+
+    class Handler(BaseHTTPRequestHandler):
+        def respond(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def answer(self, lat, lon):
+            if len(lat) != len(lon):
+                self.respond(400, {'error': '緯度と経度の数が違います'})
+                return
+            if not lat:
+                self.respond(400, {'error': '地点が指定されていません'})
+                return
+            proba = predictor.predict(lat, lon)
+            self.respond(200, {'probabilities': proba.tolist(), 'model': predictor.artifact['input_hash']})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/predict':
+                self.respond(404, {'error': 'not found'})
+                return
+            query = parse_qs(url.query)
+            try:
+                self.answer([float(v) for v in query.get('lat', [])], [float(v) for v in query.get('lon', [])])
+            except ValueError as e:
+                self.respond(400, {'error': str(e)})
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/predict':
+                self.respond(404, {'error': 'not found'})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                points = [(float(a), float(b)) for a, b in body['points']]
+            except (ValueError, KeyError, TypeError) as e:
+                self.respond(400, {'error': str(e)})
+                return
+            self.answer([p[0] for p in points], [p[1] for p in points])
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"http://{args.host}:{args.port}/predict で待ち受けています (Ctrl+C で終了)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="温泉の位置と地質から天然温泉の確率を予測する")
+    parser.add_argument("--model", default=Params.MODEL_PATH, help="保存したモデルのファイル")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="学習してモデルを保存する")
+    train_parser.add_argument("--data", default=Params.DATA_PATH, help="施設データ (JSON Lines)")
+    train_parser.add_argument("--map", default="map.png", help="地質図")
+    train_parser.set_defaults(func=command_train)
+
+    predict_parser = subparsers.add_parser("predict", help="指定した地点の確率を予測する (何も指定しなければ金沢駅)")
+    predict_parser.add_argument("points", nargs="*", help="緯度 経度 の組")
+    predict_parser.add_argument("-a", "--address", action="append", help="住所や地名 (ジオコードして予測)")
+    predict_parser.add_argument("--stdin", action="store_true", help="標準入力から1行ずつ '緯度 経度' を読んで答え続ける")
+    predict_parser.set_defaults(func=command_predict, parser=predict_parser)
+
+    heatmap_parser = subparsers.add_parser("heatmap", help="地図全体の確率を格子で求めて保存する")
+    heatmap_parser.add_argument("--rows", type=int, default=Params.HEATMAP_ROWS, help="格子の行数 (南北)")
+    heatmap_parser.add_argument("--cols", type=int, default=Params.HEATMAP_COLS, help="格子の列数 (東西)")
+    heatmap_parser.add_argument("--batch-size", type=int, default=Params.HEATMAP_BATCH, help="一度に予測する格子点の数")
+    heatmap_parser.add_argument("-j", "--jobs", type=int, default=Params.N_JOBS, help="予測に使うCPUの数")
+    heatmap_parser.add_argument("-o", "--output", default="heatmap", help="保存先 (.npy と .png を付けて保存)")
+    heatmap_parser.set_defaults(func=command_heatmap)
+
+    tune_parser = subparsers.add_parser("tune", help="地図のマス単位の交差検証でハイパーパラメーターを比べる")
+    tune_parser.add_argument("--data", default=Params.DATA_PATH, help="施設データ (JSON Lines)")
+    tune_parser.add_argument("--map", default="map.png", help="地質図")
+    tune_parser.add_argument("--folds", type=int, default=Params.CV_FOLDS, help="分割数")
+    tune_parser.add_argument("--blocks", type=int, default=Params.CV_BLOCKS, help="地図を何×何のマスに分けるか")
+    tune_parser.add_argument("-j", "--jobs", type=int, default=Params.N_JOBS, help="評価に使うCPUの数")
+    tune_parser.add_argument("--metric", choices=["accuracy", "roc_auc"], default="roc_auc", help="目標に使う指標")
+    tune_parser.add_argument("--target", type=float, help="この値以上の候補から最も軽いものを選ぶ")
+    tune_parser.set_defaults(func=command_tune)
+
+    serve_parser = subparsers.add_parser("serve", help="モデルを読み込んだままHTTPで予測に答える")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=Params.SERVE_PORT)
+    serve_parser.set_defaults(func=command_serve)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+import numpy as np
+from params import Params
+from geology import GeologyMap
+
+ARTIFACT_VERSION = 1  # 保存形式を変えたら上げる
+FEATURES = ['latitude', 'longitude', 'geology_type']
+
+
+def data_source(path=Params.DATA_PATH, fallback='Data.json'):
+    return path if os.path.exists(path) else fallback
+
+
+def load_records(path=Params.DATA_PATH, fallback='Data.json'):
+    """extract.py が書いた JSON Lines を1行ずつ読む。なければ以前の Data.json を読む"""
+    path = data_source(path, fallback)
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def model_params():
+    return {
+        'n_estimators': Params.N_ESTIMATORS,
+        'max_depth': Params.MAX_DEPTH,
+        'random_state': Params.RANDOM_STATE,
+    }
+
+
+def input_hash(data_path, map_path, params):
+    """学習データ・地質図・ハイパーパラメーターから作るハッシュ。どれかが変われば変わる"""
+    digest = hashlib.sha256()
+    for path in (data_path, map_path):
+        with open(path, 'rb') as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_training_data(geology, data_path=Params.DATA_PATH):
+    """施設データから特徴量 (緯度, 経度, 地質タイプ) と天然温泉かどうかの表を作る"""
+    import pandas as pd
+    records = [record for record in load_records(data_path) if record['latitude'] is not None]
+    latitude = np.array([record['latitude'] for record in records], dtype=np.float64)
+    longitude = np.array([record['longitude'] for record in records], dtype=np.float64)
+    X = pd.DataFrame({
+        'latitude': latitude,
+        'longitude': longitude,
+        'geology_type': geology.classify(latitude, longitude),  # 範囲外は -1
+    })
+    y = pd.Series([int('天然温泉' in record['features']) for record in records], name='is_natural')
+    return X, y
+
+
+def build_preprocess():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder
+    return ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), ["geology_type"]),  # 学習データにない地質タイプは全て0
+            ("num", "passthrough", ["latitude", "longitude"])
+        ]
+    )
+
+
+def build_model(n_estimators, max_depth, random_state):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    return Pipeline(steps=[
+        ("preprocess", build_preprocess()),
+        ("rf", RandomForestClassifier(
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            random_state=random_state
+        ))
+    ])
+
+
+def train(data_path=Params.DATA_PATH, map_path='map.png', output=Params.MODEL_PATH):
+    """モデルを学習し、地質図の色の対応と入力のハッシュと一緒に保存する"""
+    data_path = data_source(data_path)
+    params = model_params()
+    geology = GeologyMap(map_path)
+    X, y = load_training_data(geology, data_path)
+    print(f"Total: {len(X)}")
+    model = build_model(**params)
+    start = time.perf_counter()
+    model.fit(X, y)
+    artifact = {
+        'version': ARTIFACT_VERSION,
+        'created': time.time(),
+        'input_hash': input_hash(data_path, map_path, params),
+        'data_path': data_path,
+        'map_path': map_path,
+        'params': params,
+        'palette': geology.palette,  # 地質タイプ番号 → 0xRRGGBB
+        'model': model,
+    }
+    # 途中で止まっても壊れたファイルが残らないように書き込んでから置き換える
+    with open(output + '.tmp', 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(output + '.tmp', output)
+    print(f"学習時間: {time.perf_counter() - start:.2f}秒, {output} に保存しました (入力ハッシュ {artifact['input_hash'][:12]})")
+    return artifact
+
+
+def load_artifact(path=Params.MODEL_PATH):
+    with open(path, 'rb') as f:
+        artifact = pickle.load(f)
+    if artifact.get('version') != ARTIFACT_VERSION:
+        raise ValueError(f"{path} の形式 (version {artifact.get('version')}) には対応していません。train で作り直してください")
+    return artifact
+
+
+class Predictor:
+    """
+    保存したモデルを読み込み、緯度・経度の配列に対して温泉が存在する確率を返す。
+    地質タイプは保存した色の対応で求めるので、学習時と同じ番号になる。
+    """
+    def __init__(self, path=Params.MODEL_PATH):
+        self.artifact = load_artifact(path)
+        self.model = self.artifact['model']
+        self.geology = GeologyMap(self.artifact['map_path'], palette=self.artifact['palette'])
+
+    def is_stale(self):
+        """学習に使ったデータや地質図、パラメーターが変わっていれば True"""
+        return input_hash(self.artifact['data_path'], self.artifact['map_path'], model_params()) != self.artifact['input_hash']
+
+    def predict(self, latitude, longitude):
+        import pandas as pd
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        X = pd.DataFrame({
+            'latitude': latitude,
+            'longitude': longitude,
+            'geology_type': self.geology.classify(latitude, longitude),
+        })
+        return self.model.predict_proba(X[FEATURES])[:, 1]
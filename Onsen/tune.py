@@ -0,0 +1,79 @@
+import itertools
+import time
+import numpy as np
+from geology import MAP_NE, MAP_SW
+
+
+def spatial_blocks(latitude, longitude, blocks, ne=MAP_NE, sw=MAP_SW):
+    """地図の範囲を blocks × blocks のマスに分け、各地点が入るマスの番号を返す"""
+    row = np.clip(((ne[0] - np.asarray(latitude)) / (ne[0] - sw[0]) * blocks).astype(int), 0, blocks - 1)
+    col = np.clip(((np.asarray(longitude) - sw[1]) / (ne[1] - sw[1]) * blocks).astype(int), 0, blocks - 1)
+    return row * blocks + col
+
+
+def parameter_grid(grid):
+    """{'n_estimators': [..], 'max_depth': [..]} の全ての組み合わせ"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def prepare_folds(X, y, groups, folds):
+    """
+    近い地点が学習と評価に分かれないよう、マス単位で分割する (spatially blocked CV)。
+    前処理 (one-hot) は分割ごとに一度だけ学習し、変換済みの配列を全ての候補で使い回す。
+    """
+    from sklearn.model_selection import GroupKFold
+    from model import build_preprocess
+    splitter = GroupKFold(n_splits=min(folds, len(np.unique(groups))))
+    prepared = []
+    for train_index, test_index in splitter.split(X, y, groups):
+        preprocess = build_preprocess()
+        X_train = preprocess.fit_transform(X.iloc[train_index])
+        X_test = preprocess.transform(X.iloc[test_index])
+        prepared.append((X_train, y.iloc[train_index].to_numpy(), X_test, y.iloc[test_index].to_numpy()))
+    return prepared
+
+
+def evaluate(params, fold, random_state):
+    """1つの候補を1つの分割で学習・評価する (並列に実行される単位)"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, roc_auc_score
+    X_train, y_train, X_test, y_test = fold
+    model = RandomForestClassifier(random_state=random_state, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+    start = time.perf_counter()
+    proba = model.predict_proba(X_test)
+    predict_time = time.perf_counter() - start
+    # 学習データに片方のクラスしかないと列が1つになる
+    proba = proba[:, list(model.classes_).index(1)] if 1 in model.classes_ else np.zeros(len(y_test))
+    accuracy = accuracy_score(y_test, proba >= 0.5)
+    # 評価データに片方のクラスしかない分割では ROC-AUC は求められない
+    auc = roc_auc_score(y_test, proba) if len(np.unique(y_test)) == 2 else np.nan
+    return accuracy, auc, fit_time, predict_time / len(y_test)
+
+
+def tune(X, y, groups, grid, folds=5, n_jobs=-1, random_state=42):
+    """
+    パラメーターの候補ごとに、全ての分割での正解率・ROC-AUC・学習時間・1点あたりの予測時間の平均を返す。
+    (候補, 分割) の組を n_jobs 個のプロセスで並列に評価する。
+    """
+    from joblib import Parallel, delayed
+    prepared = prepare_folds(X, y, groups, folds)
+    candidates = parameter_grid(grid)
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate)(params, fold, random_state) for params in candidates for fold in prepared
+    )
+    results = []
+    for i, params in enumerate(candidates):
+        fold_scores = np.array(scores[i * len(prepared):(i + 1) * len(prepared)])
+        results.append({
+            'params': params,
+            'accuracy': fold_scores[:, 0].mean(),
+            'accuracy_std': fold_scores[:, 0].std(),
+            'roc_auc': np.nanmean(fold_scores[:, 1]) if not np.isnan(fold_scores[:, 1]).all() else np.nan,
+            'fit_time': fold_scores[:, 2].mean(),
+            'predict_time': fold_scores[:, 3].mean(),
+        })
+    return results, len(prepared)
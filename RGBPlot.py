@@ -1,15 +1,324 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk, ImageDraw
 import numpy as np
 import matplotlib.pyplot as plt
-import colorsys
-import csv
+import os
+from ImagePyramid import ImagePyramid, PyramidCanvas, open_image_source
 
 # 定数
 LINE_WIDTH = 3  # 線の太さ
 CANVAS_WIDTH = 600
 CANVAS_HEIGHT = 400
+SAMPLE_CHUNK = 1024  # 線上の点をこの数ずつまとめ、その外接矩形だけを画像ソースから読み出す
+
+def profile_dtype(float_coords=False, float_values=False):
+    """ラインプロファイルの構造化配列の型 (サブピクセル補間や帯の平均では座標・RGBを実数で保持)"""
+    coord = 'f8' if float_coords else 'i8'
+    value = 'f8' if float_values else 'u1'
+    return np.dtype([
+        ('distance', 'f8'), ('x', coord), ('y', coord),
+        ('r', value), ('g', value), ('b', value),
+        ('h', 'i2'), ('s', 'i2'), ('v', 'i2'),
+    ])
+
+def rgb_to_hsv(rgb):
+    """
+    colorsys.rgb_to_hsv を配列全体に適用したもの (N, 3) → (N, 3)。
+    値はそれぞれ 0〜1 で、colorsys と同じ順序で計算するため結果も一致します。
+    """
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    gray = rangec == 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s = np.where(gray, 0.0, rangec / maxc)
+        rc = (maxc - r) / rangec
+        gc = (maxc - g) / rangec
+        bc = (maxc - b) / rangec
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+    return np.stack([h, s, maxc], axis=1)
+
+def bilinear_sample(image_array, xs, ys):
+    """実数座標 (xs, ys) の画素値を周囲4画素から双線形補間で求めます。"""
+    height, width = image_array.shape[:2]
+    xs = np.clip(xs, 0, width - 1)
+    ys = np.clip(ys, 0, height - 1)
+    x0 = np.floor(xs).astype(int)
+    y0 = np.floor(ys).astype(int)
+    x1 = np.minimum(x0 + 1, width - 1)
+    y1 = np.minimum(y0 + 1, height - 1)
+    fx = (xs - x0)[..., np.newaxis]
+    fy = (ys - y0)[..., np.newaxis]
+    # 必要な画素だけを取り出してから実数に変換する
+    top = image_array[y0, x0, :3] * (1 - fx) + image_array[y0, x1, :3] * fx
+    bottom = image_array[y1, x0, :3] * (1 - fx) + image_array[y1, x1, :3] * fx
+    return top * (1 - fy) + bottom * fy
+
+def line_points(start_point, end_point, subpixel=False):
+    """始点から終点までのサンプル座標 (subpixel=False では整数に切り捨て)"""
+    x1, y1 = start_point
+    x2, y2 = end_point
+    num_points = max(abs(x2 - x1), abs(y2 - y1))
+    dtype = float if subpixel else int
+    return np.linspace(x1, x2, num=num_points, dtype=dtype), np.linspace(y1, y2, num=num_points, dtype=dtype)
+
+def line_normal(start_point, end_point):
+    """線に垂直な単位ベクトル"""
+    dx = end_point[0] - start_point[0]
+    dy = end_point[1] - start_point[1]
+    length = np.hypot(dx, dy)
+    if length == 0:
+        return 0.0, 0.0
+    return -dy / length, dx / length
+
+def read_band(source, band_x, band_y, subpixel=False):
+    """
+    帯の座標の外接矩形だけを画像ソースから読み出し、各座標の画素値と画像内かどうかを返します。
+    画像外の座標の画素値は意味を持ちません。
+    """
+    if subpixel:
+        inside = (band_x >= 0) & (band_x <= source.width - 1) & (band_y >= 0) & (band_y <= source.height - 1)
+    else:
+        band_x = np.rint(band_x).astype(int)
+        band_y = np.rint(band_y).astype(int)
+        inside = (band_x >= 0) & (band_x < source.width) & (band_y >= 0) & (band_y < source.height)
+    if not inside.any():
+        return np.zeros(band_x.shape + (3,)), inside
+    # 双線形補間で使う右・下の隣の画素も含める
+    x0, x1 = int(np.floor(band_x[inside].min())), min(int(np.floor(band_x[inside].max())) + 2, source.width)
+    y0, y1 = int(np.floor(band_y[inside].min())), min(int(np.floor(band_y[inside].max())) + 2, source.height)
+    region = source.read_region(x0, y0, x1, y1)
+    if subpixel:
+        return bilinear_sample(region, band_x - x0, band_y - y0), inside
+    yi = np.clip(band_y - y0, 0, region.shape[0] - 1)
+    xi = np.clip(band_x - x0, 0, region.shape[1] - 1)
+    return region[yi, xi, :3], inside  # RGB値を取得
+
+def gather_band(source, xs, ys, normal, width=1, subpixel=False):
+    """
+    座標 (xs, ys) (任意の形) ごとに、線に垂直な幅 width 画素の帯の平均RGBを求めます (..., 3)。
+    画像は線上の点 SAMPLE_CHUNK 個ごとに、その帯の外接矩形だけを source から読み出します。
+    画像外の画素は平均に含めず、帯がすべて画像外の座標は NaN になります (端の画素で代用しない)。
+    """
+    offsets = np.arange(width) - (width - 1) / 2
+    band_x = xs[..., np.newaxis] + offsets * normal[0]
+    band_y = ys[..., np.newaxis] + offsets * normal[1]
+    chunks = [
+        read_band(source, band_x[..., start:start + SAMPLE_CHUNK, :], band_y[..., start:start + SAMPLE_CHUNK, :], subpixel)
+        for start in range(0, max(band_x.shape[-2], 1), SAMPLE_CHUNK)
+    ]
+    values = np.concatenate([chunk[0] for chunk in chunks], axis=-3)
+    inside = np.concatenate([chunk[1] for chunk in chunks], axis=-2)
+    if not inside.all():
+        # 画像外の画素を除いて平均する
+        values = np.where(inside[..., np.newaxis], values, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return values.sum(axis=-2) / inside.sum(axis=-1)[..., np.newaxis]
+    if width == 1:
+        return values[..., 0, :]
+    return values.mean(axis=-2)
+
+def make_profile(distance, xs, ys, rgb, float_coords=False, float_values=False):
+    """
+    距離・座標・RGBからHSVを求め、プロファイルの構造化配列にまとめます。
+    RGBが NaN (画像外) の点は、整数で持つ H, S, V を -1 にします。
+    """
+    data = np.empty(np.shape(distance), dtype=profile_dtype(float_coords, float_values))
+    data['distance'] = distance
+    data['x'] = xs
+    data['y'] = ys
+    data['r'], data['g'], data['b'] = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    outside = np.isnan(rgb).any(axis=-1)
+    hsv = rgb_to_hsv(np.nan_to_num(rgb).reshape(-1, 3) / 255.0).reshape(rgb.shape)  # HSV値に変換
+    data['h'] = np.where(outside, -1, (hsv[..., 0] * 360).astype(int))
+    data['s'] = np.where(outside, -1, (hsv[..., 1] * 100).astype(int))
+    data['v'] = np.where(outside, -1, (hsv[..., 2] * 100).astype(int))
+    return data
+
+def sample_line(source, start_point, end_point, subpixel=False, width=1):
+    """
+    始点から終点までの線上のRGB/HSVを一括で求め、構造化配列で返します。
+    subpixel=True の場合は座標を整数に丸めず、双線形補間で画素値を求めます。
+    width を指定すると、線に垂直な幅 width 画素の帯で平均します。
+    """
+    xs, ys = line_points(start_point, end_point, subpixel)
+    rgb = gather_band(source, xs, ys, line_normal(start_point, end_point), width, subpixel)
+    distance = np.sqrt((xs - start_point[0])**2 + (ys - start_point[1])**2)  # 始点からの距離を計算
+    return make_profile(distance, xs, ys, rgb, subpixel, subpixel or width > 1)
+
+def sample_polyline(source, points, subpixel=False, width=1):
+    """
+    折れ線 (頂点のリスト) に沿ったプロファイルを返します。距離は始点から折れ線に沿って測ります。
+    """
+    profiles = []
+    offset = 0.0
+    for index, (start_point, end_point) in enumerate(zip(points[:-1], points[1:])):
+        profile = sample_line(source, start_point, end_point, subpixel, width)
+        profile['distance'] += offset
+        # 2本目以降の線分の始点は前の線分の終点と重なるので除く
+        profiles.append(profile[1:] if index > 0 else profile)
+        offset += np.hypot(end_point[0] - start_point[0], end_point[1] - start_point[1])
+    if not profiles:
+        return np.empty(0, dtype=profile_dtype(subpixel, subpixel or width > 1))
+    return np.concatenate(profiles)
+
+def sample_parallel_lines(source, start_point, end_point, offsets, subpixel=False, width=1):
+    """
+    始点・終点の線を垂直方向に offsets (画素) ずらした平行線群のプロファイルを一括で求めます。
+    画像からはみ出す平行線は除くので、戻り値は (画像内に収まる線の本数, 点の数) の構造化配列です。
+    """
+    xs, ys = line_points(start_point, end_point, subpixel)
+    normal = line_normal(start_point, end_point)
+    offsets = np.asarray(offsets, dtype=float)[:, np.newaxis]
+    shift_x = offsets * normal[0]
+    shift_y = offsets * normal[1]
+    if not subpixel:
+        shift_x = np.rint(shift_x).astype(int)
+        shift_y = np.rint(shift_y).astype(int)
+    line_x = xs[np.newaxis, :] + shift_x
+    line_y = ys[np.newaxis, :] + shift_y
+    inside = ((line_x >= 0) & (line_x <= source.width - 1) & (line_y >= 0) & (line_y <= source.height - 1)).all(axis=1)
+    line_x, line_y = line_x[inside], line_y[inside]
+    rgb = gather_band(source, line_x, line_y, normal, width, subpixel)
+    distance = np.broadcast_to(np.sqrt((xs - start_point[0])**2 + (ys - start_point[1])**2), line_x.shape)
+    return make_profile(distance, line_x, line_y, rgb, subpixel, subpixel or width > 1)
+
+# エクスポート時の列名 (CSVのヘッダー)
+CSV_HEADER = ["距離", "x", "y", "R", "G", "B", "H", "S", "V"]
+LINE_HEADER = "線番号"
+EXPORT_FORMATS = {'.csv': 'csv', '.npy': 'npy', '.parquet': 'parquet', '.h5': 'hdf5', '.hdf5': 'hdf5'}
+
+def flatten_profile(data, line=None):
+    """
+    プロファイルを1次元の構造化配列にします。平行線群 (線の本数, 点の数) の場合や
+    line を指定した場合は、先頭に線番号の列 'line' を加えます。
+    """
+    if data.ndim == 1 and line is None:
+        return data
+    lines = np.broadcast_to(np.arange(data.shape[0])[:, np.newaxis], data.shape) if data.ndim == 2 else np.full(data.shape, line)
+    flat = np.empty(data.size, dtype=[('line', 'i8')] + data.dtype.descr)
+    flat['line'] = lines.ravel()
+    for name in data.dtype.names:
+        flat[name] = data[name].ravel()
+    return flat
+
+def export_format(path):
+    fmt = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"未対応の保存形式です: {path}")
+    return fmt
+
+def export_profile(data, path, encoding='utf-8'):
+    """
+    プロファイルを拡張子に応じた形式 (CSV / .npy / Parquet / HDF5) で一括保存します。
+    """
+    with ProfileWriter(path, encoding, with_line=data.ndim == 2) as writer:
+        writer.append(data)
+
+class ProfileWriter:
+    """
+    プロファイルを追記しながら保存します。バッチ処理で全プロファイルをメモリに保持せずに済みます。
+    Parquet は pyarrow、HDF5 は h5py が必要です。
+    """
+    def __init__(self, path, encoding='utf-8', with_line=True):
+        self.path = path
+        self.with_line = with_line
+        self.format = export_format(path)
+        self.encoding = encoding
+        self.dtype = None
+        self.count = 0
+        self.lines = 0
+        self.file = None
+        self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, data, line=None):
+        """プロファイル (1本または平行線群) を追記します。線番号は追記した順に振られます。"""
+        if data.ndim == 2:
+            flat = flatten_profile(data)
+            flat['line'] += self.lines
+            self.lines += data.shape[0]
+        else:
+            if self.with_line and line is None:
+                line = self.lines
+            flat = flatten_profile(data, line)
+            self.lines += 1
+        if self.dtype is None:
+            self._open(flat.dtype)
+        flat = flat.astype(self.dtype, copy=False)
+        getattr(self, f"_append_{self.format}")(flat)
+        self.count += len(flat)
+
+    def _open(self, dtype):
+        self.dtype = dtype
+        if self.format == 'csv':
+            self.file = open(self.path, mode="w", newline='', encoding=self.encoding)
+            header = ([LINE_HEADER] if 'line' in dtype.names else []) + CSV_HEADER
+            self.file.write(",".join(header) + "\n")
+        elif self.format == 'npy':
+            # 要素数は close 時に確定するので、ヘッダー領域を確保しておく
+            self.file = open(self.path, 'wb')
+            self.header_size = len(self._npy_header(10**18))
+            self.file.write(self._npy_header(0))
+        elif self.format == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Parquet形式の保存には pyarrow が必要です。\npip install pyarrow でインストールしてください。")
+            self.schema = pa.schema([(name, pa.from_numpy_dtype(dtype[name])) for name in dtype.names])
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        else:
+            try:
+                import h5py
+            except ImportError:
+                raise ImportError("HDF5形式の保存には h5py が必要です。\npip install h5py でインストールしてください。")
+            self.file = h5py.File(self.path, 'w')
+            self.writer = self.file.create_dataset('profile', shape=(0,), maxshape=(None,), dtype=dtype, chunks=True)
+
+    def _npy_header(self, count):
+        header = {'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False, 'shape': (count,)}
+        text = repr(header)
+        size = getattr(self, 'header_size', None)
+        if size is None:
+            size = -(-(10 + len(text) + 1) // 64) * 64
+        text = text.ljust(size - 10 - 1) + "\n"
+        return b'\x93NUMPY\x01\x00' + len(text).to_bytes(2, 'little') + text.encode('latin1')
+
+    def _append_csv(self, flat):
+        # 列ごとにまとめて文字列化し、1回の write で書き込む
+        columns = [map(str, flat[name].tolist()) for name in self.dtype.names]
+        self.file.write("".join(",".join(row) + "\n" for row in zip(*columns)))
+
+    def _append_npy(self, flat):
+        self.file.write(flat.tobytes())
+
+    def _append_parquet(self, flat):
+        import pyarrow as pa
+        self.writer.write_table(pa.Table.from_arrays([flat[name] for name in self.dtype.names], schema=self.schema))
+
+    def _append_hdf5(self, flat):
+        self.writer.resize((self.count + len(flat),))
+        self.writer[self.count:] = flat
+
+    def close(self):
+        if self.dtype is None:
+            return
+        if self.format == 'npy':
+            self.file.seek(0)
+            self.file.write(self._npy_header(self.count))
+        if self.format == 'parquet':
+            self.writer.close()
+        elif self.file is not None:
+            self.file.close()
+        self.dtype = None
 
 class ImageAnalysisApp:
     def __init__(self, root):
@@ -18,12 +327,15 @@ class ImageAnalysisApp:
         self.canvas = tk.Canvas(root, width=CANVAS_WIDTH, height=CANVAS_HEIGHT)
         self.canvas.pack()
 
-        self.image = None
-        self.image_copy = None  # キャンバスに表示するコピー用のイメージ
-        self.scale_factor = 1.0  # 拡大率
+        self.source = None  # 解析用の画像ソース (無圧縮ならメモリマップ)
+        self.pyramid = None  # 表示用の多重解像度ピラミッド
+        self.mode = None
         self.start_point = None
         self.end_point = None
-        self.rgb_hsv_data = []
+        self.via_points = []  # 始点と終点の間の経由点 (折れ線)
+        self.rgb_hsv_data = np.empty(0, dtype=profile_dtype())
+        self.sweep_data = None  # 平行線群のプロファイル (線の本数, 点の数)
+        self.subpixel = tk.BooleanVar(value=False)  # サブピクセル補間の有無
         self.current_plot = None  # グラフのウィンドウを管理
 
         # メニュー設定
@@ -55,123 +367,145 @@ class ImageAnalysisApp:
         self.end_label = tk.Label(btn_frame, text="終点: 未設定")
         self.end_label.grid(row=2, column=1, padx=5, pady=5)
 
-        # CSV保存ボタン
-        self.csv_button = tk.Button(btn_frame, text="CSV保存", command=self.save_csv)
-        self.csv_button.grid(row=3, column=0, columnspan=2, padx=5, pady=5)
-
+        # 保存ボタン (CSV / NPY / Parquet / HDF5) とCSVの文字コード
+        self.csv_button = tk.Button(btn_frame, text="保存", command=self.save_csv)
+        self.csv_button.grid(row=3, column=0, padx=5, pady=5)
+        self.csv_encoding = tk.StringVar(value='utf-8')
+        tk.OptionMenu(btn_frame, self.csv_encoding, 'utf-8', 'utf-8-sig', 'shift-jis').grid(row=3, column=1, padx=5, pady=5)
+
+        # サブピクセル補間の切り替え
+        self.subpixel_check = tk.Checkbutton(btn_frame, text="サブピクセル補間", variable=self.subpixel, command=self.analyze_line)
+        self.subpixel_check.grid(row=0, column=1, padx=5, pady=5)
+
+        # 線幅 (垂直方向に平均する画素数)、平行線の本数と間隔
+        band_frame = tk.Frame(btn_frame)
+        band_frame.grid(row=4, column=0, columnspan=2, padx=5, pady=5)
+        tk.Label(band_frame, text="線幅").pack(side=tk.LEFT)
+        self.band_width = tk.Spinbox(band_frame, from_=1, to=500, width=5)
+        self.band_width.pack(side=tk.LEFT)
+        tk.Label(band_frame, text="平行線の本数").pack(side=tk.LEFT)
+        self.line_count = tk.Spinbox(band_frame, from_=1, to=1000, width=5)
+        self.line_count.pack(side=tk.LEFT)
+        tk.Label(band_frame, text="間隔").pack(side=tk.LEFT)
+        self.line_spacing = tk.Spinbox(band_frame, from_=1, to=1000, width=5)
+        self.line_spacing.pack(side=tk.LEFT)
+
+        # 経由点 (折れ線) の追加とクリア
+        self.via_button = tk.Button(btn_frame, text="経由点を追加", command=self.set_via_mode, bg="lightgray")
+        self.via_button.grid(row=5, column=0, padx=5, pady=5)
+        self.clear_via_button = tk.Button(btn_frame, text="経由点をクリア", command=self.clear_via_points)
+        self.clear_via_button.grid(row=5, column=1, padx=5, pady=5)
+
+        # 表示範囲のタイルだけを描画 (ホイールで拡大・縮小、右ドラッグで移動)
+        self.view = PyramidCanvas(self.canvas, CANVAS_WIDTH, CANVAS_HEIGHT, on_render=self.draw_line_on_image)
         self.canvas.bind("<Button-1>", self.handle_click)
 
     def open_image(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.bmp")])
+        file_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg;*.bmp;*.tif;*.tiff;*.npy")])
         if file_path:
-            self.image = Image.open(file_path)
-            self.scale_image_to_canvas()
-            self.display_image()
-
-    def scale_image_to_canvas(self):
-        """キャンバスに収まるように画像を拡大・縮小する"""
-        img_width, img_height = self.image.size
-        scale_w = CANVAS_WIDTH / img_width
-        scale_h = CANVAS_HEIGHT / img_height
-        self.scale_factor = min(scale_w, scale_h)  # 画像がキャンバスに収まるようにスケールを決定
-
-        new_size = (int(img_width * self.scale_factor), int(img_height * self.scale_factor))
-        self.image_copy = self.image.resize(new_size, Image.Resampling.BILINEAR)  # キャンバスサイズに合わせてリサイズ
-
-        # 拡大率ラベルの更新
-        self.scale_label.config(text=f"拡大率: {int(self.scale_factor * 100)}%")
-
-    def display_image(self):
-        """キャンバスに画像を表示する"""
-        self.photo_image = ImageTk.PhotoImage(self.image_copy)
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo_image)
+            # 無圧縮のBMP/TIFFはメモリマップし、表示するタイルと線の周りだけを読む
+            self.source = open_image_source(file_path)
+            self.pyramid = ImagePyramid(self.source)
+            self.view.set_pyramid(self.pyramid)  # キャンバスに収まる倍率で表示
 
     def set_start_mode(self):
         """始点決定モードに設定"""
         self.mode = 'start'
         self.start_button.config(bg="lightblue")  # 始点モード選択時の色
         self.end_button.config(bg="lightgray")  # 終点モードは未選択状態の色
+        self.via_button.config(bg="lightgray")
 
     def set_end_mode(self):
         """終点決定モードに設定"""
         self.mode = 'end'
         self.end_button.config(bg="lightblue")  # 終点モード選択時の色
         self.start_button.config(bg="lightgray")  # 始点モードは未選択状態の色
+        self.via_button.config(bg="lightgray")
+
+    def set_via_mode(self):
+        """経由点追加モードに設定"""
+        self.mode = 'via'
+        self.via_button.config(bg="lightblue")
+
+    def clear_via_points(self):
+        """経由点をすべて削除"""
+        self.via_points = []
+        if self.start_point and self.end_point:
+            self.redraw_and_analyze()
+
+    def path_points(self):
+        """始点・経由点・終点をつないだ折れ線の頂点"""
+        return [self.start_point] + self.via_points + [self.end_point]
 
     def handle_click(self, event):
         """クリック時に始点か終点を設定"""
-        if self.mode == 'start' and self.image_copy:
-            # キャンバスのクリック座標を元画像の座標に変換
-            self.start_point = (int(event.x / self.scale_factor), int(event.y / self.scale_factor))
+        # キャンバスのクリック座標を元画像の座標に変換 (画像外なら無視)
+        point = self.view.canvas_to_image(event.x, event.y)
+        if self.pyramid is None or point[0] is None:
+            return
+        if self.mode == 'start':
+            self.start_point = point
             self.start_label.config(text=f"始点: {self.start_point}")
             self.mode = None  # モード解除
             self.start_button.config(bg="lightgray")  # モード解除後は元の色に戻す
-        elif self.mode == 'end' and self.image_copy:
-            # キャンバスのクリック座標を元画像の座標に変換
-            self.end_point = (int(event.x / self.scale_factor), int(event.y / self.scale_factor))
+        elif self.mode == 'end':
+            self.end_point = point
             self.end_label.config(text=f"終点: {self.end_point}")
             self.mode = None  # モード解除
             self.end_button.config(bg="lightgray")  # モード解除後は元の色に戻す
+        elif self.mode == 'via':
+            # 経由点は続けて追加できるようにモードを解除しない
+            self.via_points.append(point)
+
+        if self.start_point and self.end_point:
+            self.redraw_and_analyze()
+
+    def redraw_and_analyze(self):
+        """線を描き直して解析する"""
+        self.draw_line_on_image(self.view)
+        self.analyze_line()
 
+    def draw_line_on_image(self, view):
+        """始点と終点を結ぶ赤い線 (経由点があれば折れ線) をキャンバスに重ねて描画する"""
+        self.scale_label.config(text=f"拡大率: {int(view.zoom * 100)}%")
+        self.canvas.delete('line')
         if self.start_point and self.end_point:
-            # 新しい始点と終点が決まったら画像を再コピー
-            self.image_copy = self.image.resize(
-                (int(self.image.width * self.scale_factor), int(self.image.height * self.scale_factor))
-            )
-            self.draw_line_on_image()
-            self.analyze_line()
-
-    def draw_line_on_image(self):
-        """始点と終点を結ぶ赤い線を画像上に描画する"""
-        if self.image_copy:
-            draw = ImageDraw.Draw(self.image_copy)
-            # 元画像の始点と終点をキャンバス上の座標に変換
-            scaled_start = (int(self.start_point[0] * self.scale_factor), int(self.start_point[1] * self.scale_factor))
-            scaled_end = (int(self.end_point[0] * self.scale_factor), int(self.end_point[1] * self.scale_factor))
-            draw.line([scaled_start, scaled_end], fill="red", width=LINE_WIDTH)
-            self.display_image()
+            # 元画像の座標をキャンバス上の座標に変換
+            scaled = [view.image_to_canvas(x + 0.5, y + 0.5) for x, y in self.path_points()]
+            self.canvas.create_line(*[c for point in scaled for c in point], fill="red", width=LINE_WIDTH, tags='line')
 
     def analyze_line(self):
         """線上のRGBとHSV値を解析し、散布図を表示"""
-        if self.image is None or self.start_point is None or self.end_point is None:
+        if self.source is None or self.start_point is None or self.end_point is None:
             return
 
         # 以前のグラフウィンドウを閉じる
         if self.current_plot:
             plt.close(self.current_plot)
 
-        # 画像をnumpy配列に変換
-        image_array = np.array(self.image)
-
-        # 線上の点を取得する
-        x1, y1 = self.start_point
-        x2, y2 = self.end_point
-        num_points = max(abs(x2 - x1), abs(y2 - y1))
-        x_values = np.linspace(x1, x2, num=num_points, dtype=int)
-        y_values = np.linspace(y1, y2, num=num_points, dtype=int)
-
-        self.rgb_hsv_data = []
-        for idx, (x, y) in enumerate(zip(x_values, y_values)):
-            r, g, b = image_array[y, x, :3]  # RGB値を取得
-            hsv = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)  # HSV値に変換
-            distance = np.sqrt((x - x1)**2 + (y - y1)**2)  # 始点からの距離を計算
-            self.rgb_hsv_data.append({
-                "distance": distance,
-                "x": x,
-                "y": y,
-                "rgb": (r, g, b),
-                "hsv": (int(hsv[0] * 360), int(hsv[1] * 100), int(hsv[2] * 100))
-            })
-
+        subpixel = self.subpixel.get()
+        width = max(1, int(self.band_width.get()))
+        count = max(1, int(self.line_count.get()))
+        self.rgb_hsv_data = sample_polyline(self.source, self.path_points(), subpixel, width)
+
+        # 平行線群は始点・終点を結ぶ直線を中心に、間隔ずつずらして一括で解析する
+        self.sweep_data = None
+        if count > 1:
+            offsets = (np.arange(count) - (count - 1) / 2) * float(self.line_spacing.get())
+            self.sweep_data = sample_parallel_lines(self.source, self.start_point, self.end_point, offsets, subpixel, width)
+            if len(self.sweep_data) < count:
+                print(f"画像からはみ出す平行線 {count - len(self.sweep_data)} 本を除きました")
+            if len(self.sweep_data) == 0:
+                self.sweep_data = None
         self.plot_rgb()
 
     def plot_rgb(self):
         """RGBの散布図を描画"""
-        if not self.rgb_hsv_data:
+        if len(self.rgb_hsv_data) == 0:
             return
 
-        distances = np.array([d["distance"] for d in self.rgb_hsv_data])
-        rgb_values = np.array([d["rgb"] for d in self.rgb_hsv_data])
+        distances = self.rgb_hsv_data["distance"]
+        rgb_values = np.stack([self.rgb_hsv_data["r"], self.rgb_hsv_data["g"], self.rgb_hsv_data["b"]], axis=1)
 
         # 新しいプロットウィンドウを作成
         self.current_plot = plt.figure()
@@ -186,26 +520,35 @@ class ImageAnalysisApp:
         plt.legend()
 
         plt.tight_layout()
+        if self.sweep_data is not None:
+            self.plot_sweep()
         plt.show()
 
+    def plot_sweep(self):
+        """平行線群のRGBを (線, 距離) の画像として表示"""
+        fig, axes = plt.subplots(1, 3, figsize=(12, 4))
+        for ax, channel, cmap in zip(axes, ["r", "g", "b"], ["Reds", "Greens", "Blues"]):
+            ax.imshow(self.sweep_data[channel], aspect="auto", cmap=cmap, vmin=0, vmax=255)
+            ax.set_title(channel.upper())
+            ax.set_xlabel("点の番号", fontname="MS Gothic")
+        axes[0].set_ylabel("平行線の番号", fontname="MS Gothic")
+        fig.tight_layout()
+
     def save_csv(self):
-        """RGBとHSV値をCSVとして保存"""
-        if not self.rgb_hsv_data:
+        """RGBとHSV値を保存 (平行線群があればそれも含めて保存)"""
+        if len(self.rgb_hsv_data) == 0:
             messagebox.showerror("エラー", "データがありません。")
             return
 
-        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[
+            ("CSV files", "*.csv"), ("NumPy files", "*.npy"), ("Parquet files", "*.parquet"), ("HDF5 files", "*.h5;*.hdf5")
+        ])
         if file_path:
-            with open(file_path, mode="w", newline='', encoding='shift-jis') as file:
-                writer = csv.writer(file)
-                # ヘッダー行
-                writer.writerow(["距離", "x", "y", "R", "G", "B", "H", "S", "V"])
-                for data in self.rgb_hsv_data:
-                    distance = data["distance"]
-                    x, y = data["x"], data["y"]
-                    r, g, b = data["rgb"]
-                    h, s, v = data["hsv"]
-                    writer.writerow([distance, x, y, r, g, b, h, s, v])
+            data = self.sweep_data if self.sweep_data is not None else self.rgb_hsv_data
+            try:
+                export_profile(data, file_path, self.csv_encoding.get())
+            except (ImportError, ValueError) as e:
+                messagebox.showerror("エラー", str(e))
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -5,38 +5,61 @@ from tkinter import ttk
 from PIL import Image, ImageTk
 import numpy as np
 import matplotlib.pyplot as plt
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
 
 # 動画ファイルを読み込む
 def load_video():
-    global current_video, cap, original_width, original_height
+    global current_video, cap, original_width, original_height, preview
     filepath = filedialog.askopenfilename(filetypes=[("Video files", "*.mp4 *.avi *.mkv")])
     if filepath:
         current_video = filepath
         cap = cv2.VideoCapture(filepath)
         original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if preview is not None:
+            preview.close()
+        # サムネイル索引の作成とフレームのデコードはバックグラウンドで行う
+        preview = ScrubPreview(filepath, (fixed_width, fixed_height))
         display_frame(0)  # 初期フレームを表示
         scrollbar.config(to=int(cap.get(cv2.CAP_PROP_FRAME_COUNT) - 1))  # フレーム数を設定
 
 # 指定したフレーム番号での画像を表示
+# 先にサムネイルを表示し、フル解像度のフレームはデコードが終わり次第 poll_preview で差し替える
 def display_frame(frame_number):
-    global current_frame, resized_frame
+    global current_frame
     current_frame = frame_number
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-    ret, frame = cap.read()
-    if ret:
-        # フレームをTkinterに表示するために縮小
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        resized_frame = cv2.resize(frame_rgb, (fixed_width, fixed_height))
-        img = Image.fromarray(resized_frame)
-        img_tk = ImageTk.PhotoImage(img)
-        label_image.config(image=img_tk)
-        label_image.image = img_tk
+    thumb = preview.thumbnail(frame_number)
+    if thumb is not None:
+        show_image(cv2.resize(thumb, (fixed_width, fixed_height)))
+    preview.request(frame_number)
+
+def show_image(frame_rgb):
+    global resized_frame
+    resized_frame = frame_rgb
+    img = Image.fromarray(resized_frame)
+    img_tk = ImageTk.PhotoImage(img)
+    label_image.config(image=img_tk)
+    label_image.image = img_tk
+
+# デコード済みのフレームがあれば表示 (Tkの操作はメインスレッドで行う)
+def poll_preview():
+    if preview is not None:
+        result = preview.take_result()
+        if result is not None and result[0] == current_frame:
+            show_image(result[1])
+    root.after(PREVIEW_POLL_MS, poll_preview)
 
 # スクロールバーでフレーム位置を更新
 def on_scroll(event):
     frame_number = scrollbar.get()
-    display_frame(int(frame_number))
+    if preview is not None:
+        display_frame(int(float(frame_number)))
 
 # フレーム画像上でクリックされた位置を取得
 def on_click(event):
@@ -51,92 +74,577 @@ def on_click(event):
     print(f"選択した縮小後の座標: x={selected_x}, y={selected_y}")
     print(f"元の座標に変換: x={original_x}, y={original_y}")
 
+# Shift+クリックでROIを追加登録 (領域サイズはクリック時の入力値)
+def on_shift_click(event):
+    on_click(event)
+    roi_list.append(point_roi(original_x, original_y, int(entry_region_size.get())))
+    print(f"ROIを追加しました (登録数: {len(roi_list)})")
+
+def clear_rois():
+    roi_list.clear()
+    print("登録したROIをクリアしました")
+
+# 選択点近辺の領域を計算 (領域外にはみ出す分は切り詰める)
+def region_bounds(x, y, region_size, width, height):
+    x1 = max(0, x - region_size // 2)
+    y1 = max(0, y - region_size // 2)
+    x2 = min(width, x + region_size // 2)
+    y2 = min(height, y + region_size // 2)
+    return x1, y1, x2, y2
+
+# ROIの定義 (座標はすべて元のフレーム解像度)
+def point_roi(x, y, size):
+    return {'type': 'point', 'x': x, 'y': y, 'size': size}
+
+def rect_roi(x1, y1, x2, y2):
+    return {'type': 'rect', 'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+
+def circle_roi(x, y, radius):
+    return {'type': 'circle', 'x': x, 'y': y, 'radius': radius}
+
+def polygon_roi(points):
+    return {'type': 'polygon', 'points': [tuple(p) for p in points]}
+
+# ROIに含まれる画素の (y, x) 座標を求める
+def roi_pixels(roi, width, height):
+    kind = roi['type']
+    if kind == 'point':
+        x1, y1, x2, y2 = region_bounds(roi['x'], roi['y'], roi['size'], width, height)
+    elif kind == 'rect':
+        x1, y1 = max(0, roi['x1']), max(0, roi['y1'])
+        x2, y2 = min(width, roi['x2']), min(height, roi['y2'])
+    elif kind == 'circle':
+        r = roi['radius']
+        x1, y1 = max(0, roi['x'] - r), max(0, roi['y'] - r)
+        x2, y2 = min(width, roi['x'] + r + 1), min(height, roi['y'] + r + 1)
+    elif kind == 'polygon':
+        pts = np.array(roi['points'], dtype=np.int32)
+        x1, y1 = max(0, pts[:, 0].min()), max(0, pts[:, 1].min())
+        x2, y2 = min(width, pts[:, 0].max() + 1), min(height, pts[:, 1].max() + 1)
+    else:
+        raise ValueError(f"未対応のROI種別です: {kind}")
+    ys, xs = np.mgrid[y1:max(y1, y2), x1:max(x1, x2)]
+    if kind == 'circle':
+        inside = (xs - roi['x']) ** 2 + (ys - roi['y']) ** 2 <= roi['radius'] ** 2
+        ys, xs = ys[inside], xs[inside]
+    elif kind == 'polygon':
+        mask = np.zeros(ys.shape, dtype=np.uint8)
+        cv2.fillPoly(mask, [pts - [x1, y1]], 1)
+        ys, xs = ys[mask > 0], xs[mask > 0]
+    return ys.ravel(), xs.ravel()
+
+# 統計量の名前 ('mean', 'median', 'std', 'min', 'max', 'p5' などのパーセンタイル) を計算関数に変換
+def stat_function(name):
+    funcs = {
+        'mean': lambda pix: pix.sum(axis=1, dtype=np.int64) / pix.shape[1],
+        'median': lambda pix: np.median(pix, axis=1),
+        'std': lambda pix: pix.std(axis=1),
+        'min': lambda pix: pix.min(axis=1),
+        'max': lambda pix: pix.max(axis=1),
+    }
+    if name in funcs:
+        return funcs[name]
+    if name.startswith('p'):
+        q = float(name[1:])
+        return lambda pix: np.percentile(pix, q, axis=1)
+    raise ValueError(f"未対応の統計量です: {name}")
+
+class RoiSet:
+    """
+    複数のROIをまとめて計測します。
+    画素数が同じROIは1つのインデックス配列にまとめ、1回の gather と軸方向の集計で処理します。
+    """
+    def __init__(self, rois, width, height):
+        self.rois = list(rois)
+        self.width = width
+        self.height = height
+        groups = {}
+        for roi_idx, roi in enumerate(self.rois):
+            ys, xs = roi_pixels(roi, width, height)
+            groups.setdefault(len(ys), []).append((roi_idx, ys * width + xs))
+        # 画素数ごとに (ROI番号の配列, (ROI数, 画素数) のフラットインデックス)
+        self.groups = [
+            (np.array([i for i, _ in members]), np.stack([idx for _, idx in members]))
+            for members in groups.values()
+        ]
+
+    def measure(self, frame, stats):
+        """BGRフレーム1枚から {統計量: (ROI数, 3) のRGB配列} を返します。"""
+        flat = frame.reshape(-1, 3)
+        result = {name: np.empty((len(self.rois), 3)) for name in stats}
+        for roi_indices, flat_indices in self.groups:
+            pix = flat[flat_indices]  # (ROI数, 画素数, 3)
+            for name, func in stats.items():
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    value = func(pix) if pix.shape[1] else np.full((len(roi_indices), 3), np.nan)
+                result[name][roi_indices] = value[:, ::-1]  # BGR→RGB
+        return result
+
+# 読み飛ばすフレーム数がこれを超える場合は grab() を繰り返さずにシークする
+SEEK_THRESHOLD = 120
+
+# 間引き間隔と時間範囲 (秒) から解析するフレーム番号を決める
+def select_frames(frame_count, fps, stride=1, start_time=None, end_time=None):
+    start = 0 if start_time is None or not fps else max(0, int(round(start_time * fps)))
+    end = frame_count if end_time is None or not fps else min(frame_count, int(round(end_time * fps)))
+    return np.arange(start, end, max(1, stride))
+
+# デコードせずにパケットだけを読み、キーフレームのフレーム番号を列挙
+def find_keyframes(video_path, start=0, end=None):
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_FORMAT, -1)  # 生のパケットを返すモード
+    keyframes = []
+    idx = 0
+    while (end is None or idx < end) and cap.grab():
+        if idx >= start and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keyframes.append(idx)
+        idx += 1
+    cap.release()
+    return np.array(keyframes, dtype=int)
+
+# 昇順のフレーム番号のフレームだけを読み出す
+# 間のフレームは grab() で読み飛ばし (色変換・転送をしない)、大きく離れている場合はシークする
+def read_frames(cap, frame_indices):
+    pos = 0  # 次に読まれるフレーム番号
+    for idx in frame_indices:
+        if idx < pos or idx - pos > SEEK_THRESHOLD:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            pos = idx
+        while pos < idx:
+            if not cap.grab():
+                return
+            pos += 1
+        ret, frame = cap.read()
+        if not ret:
+            return
+        pos += 1
+        yield idx, frame
+
+# 全ROIの統計量を各フレームでまとめて計算
+# stride: 間引き間隔, start_time/end_time: 解析範囲 (秒)
+# keyframes_only: 範囲内のキーフレームのみ (stride はキーフレームの間引きになる)
+# frames: 解析するフレーム番号を直接指定 (他の指定より優先)
+# 戻り値は (フレーム番号の配列, {統計量: (フレーム数, ROI数, 3) のRGB配列})
+def compute_roi_stats(video_path, rois, stats=('mean',), stride=1, start_time=None, end_time=None,
+                      keyframes_only=False, frames=None):
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    roi_set = RoiSet(rois, width, height)
+    stat_funcs = {name: stat_function(name) for name in stats}
+
+    if frames is None and keyframes_only:
+        window = select_frames(frame_count, fps, 1, start_time, end_time)
+        frames = find_keyframes(video_path, window[0], window[-1] + 1)[::max(1, stride)] if len(window) else window
+    elif frames is None:
+        frames = select_frames(frame_count, fps, stride, start_time, end_time)
+    frames = np.sort(np.asarray(frames, dtype=int))
+
+    frame_indices = []
+    series = {name: [] for name in stats}
+    for idx, frame in read_frames(cap, frames):
+        frame_indices.append(idx)
+        for name, value in roi_set.measure(frame, stat_funcs).items():
+            series[name].append(value)
+
+    cap.release()
+    series = {name: np.array(values).reshape(-1, len(roi_set.rois), 3) for name, values in series.items()}
+    return np.array(frame_indices, dtype=int), series
+
+# 粗い間隔で解析し、平均RGBの変化がしきい値を超えた区間だけ全フレームを追加で解析
+# 粗い解析には範囲の最後のフレームも含め、最後の間隔も変化を調べられるようにする
+def compute_roi_stats_adaptive(video_path, rois, stats=('mean',), coarse_stride=30, threshold=5.0,
+                               start_time=None, end_time=None):
+    needed = tuple(stats) if 'mean' in stats else tuple(stats) + ('mean',)
+    cap = cv2.VideoCapture(video_path)
+    window = select_frames(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS), 1, start_time, end_time)
+    cap.release()
+    coarse = window[::max(1, coarse_stride)]
+    if len(window) and coarse[-1] != window[-1]:
+        coarse = np.append(coarse, window[-1])
+    frames, series = compute_roi_stats(video_path, rois, needed, frames=coarse)
+    if len(frames) < 2:
+        return frames, {name: series[name] for name in stats}
+
+    with np.errstate(invalid='ignore'):
+        change = np.nan_to_num(np.abs(np.diff(series['mean'], axis=0))).max(axis=(1, 2))
+    dense = [np.arange(frames[i] + 1, frames[i + 1]) for i in np.nonzero(change > threshold)[0]]
+    if dense:
+        dense_frames, dense_series = compute_roi_stats(video_path, rois, needed, frames=np.concatenate(dense))
+        frames = np.concatenate([frames, dense_frames])
+        series = {name: np.concatenate([series[name], dense_series[name]]) for name in needed}
+        order = np.argsort(frames, kind='stable')
+        frames = frames[order]
+        series = {name: values[order] for name, values in series.items()}
+    return frames, {name: series[name] for name in stats}
+
+# 選択点近辺の平均RGB値をフレームごとに取得
+def compute_region_rgb(video_path, x, y, region_size):
+    _, series = compute_roi_stats(video_path, [point_roi(x, y, region_size)])
+    return series['mean'][:, 0, :]
+
+# 解析結果のディスクキャッシュ
+ANALYSIS_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'VideoRGB')
+ANALYSIS_CACHE_BYTES = 1024 * 1024 * 1024  # キャッシュ全体の上限
+
+def _digest(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+# 動画ファイルの識別情報 (サイズ+更新時刻、content_hash=True なら内容のハッシュ)
+def video_signature(video_path, content_hash=False):
+    st = os.stat(video_path)
+    signature = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if content_hash:
+        h = hashlib.sha1()
+        with open(video_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                h.update(chunk)
+        signature['sha1'] = h.hexdigest()
+    return signature
+
+def _cache_size(cache_dir):
+    total = 0
+    for dirpath, _, files in os.walk(cache_dir):
+        for name in files:
+            total += os.path.getsize(os.path.join(dirpath, name))
+    return total
+
+# 最近使われていないエントリから削除し、キャッシュ全体を max_bytes 以下にする
+def evict_analysis_cache(cache_dir=ANALYSIS_CACHE_DIR, max_bytes=ANALYSIS_CACHE_BYTES):
+    entries = []
+    for video_dir in glob.glob(os.path.join(cache_dir, '*')):
+        for entry_dir in glob.glob(os.path.join(video_dir, '*', '')):
+            frames_path = os.path.join(entry_dir, 'frames.npy')
+            last_used = os.path.getmtime(frames_path) if os.path.exists(frames_path) else 0
+            entries.append((last_used, entry_dir))
+    total = _cache_size(cache_dir)
+    for _, entry_dir in sorted(entries):
+        if total <= max_bytes:
+            break
+        total -= _cache_size(entry_dir)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+
+# compute_roi_stats の結果をディスクにキャッシュして返す
+# ROIごと・統計量ごとに (フレーム数, 3) の .npy として保存するため、
+# 計算済みROIの一部だけの解析はキャッシュから返し、未計算のROIだけをデコードして計算する
+def cached_roi_stats(video_path, rois, stats=('mean',), cache_dir=ANALYSIS_CACHE_DIR,
+                     max_bytes=ANALYSIS_CACHE_BYTES, content_hash=False, **sampling):
+    signature = video_signature(video_path, content_hash)
+    video_dir = os.path.join(cache_dir, _digest(os.path.abspath(video_path)))
+    signature_path = os.path.join(video_dir, 'source.json')
+    if os.path.exists(signature_path):
+        with open(signature_path, encoding='utf-8') as f:
+            if json.load(f) != signature:
+                # 元の動画が変更されたので、この動画のキャッシュをすべて無効にする
+                shutil.rmtree(video_dir, ignore_errors=True)
+    os.makedirs(video_dir, exist_ok=True)
+    with open(signature_path, 'w', encoding='utf-8') as f:
+        json.dump(signature, f)
+
+    if sampling.get('frames') is not None:
+        sampling['frames'] = [int(i) for i in sampling['frames']]
+    entry_dir = os.path.join(video_dir, _digest(sampling))
+    frames_path = os.path.join(entry_dir, 'frames.npy')
+    roi_keys = [_digest(roi) for roi in rois]
+
+    def column_path(roi_key, name):
+        return os.path.join(entry_dir, f'{roi_key}_{name}.npy')
+
+    if os.path.exists(frames_path):
+        missing = [i for i, key in enumerate(roi_keys)
+                   if not all(os.path.exists(column_path(key, name)) for name in stats)]
+    else:
+        missing = list(range(len(rois)))
+    if not missing:
+        os.utime(frames_path)  # 最近使ったエントリとして記録
+        frames = np.load(frames_path)
+        series = {
+            name: np.stack([np.load(column_path(key, name)) for key in roi_keys], axis=1).reshape(len(frames), len(rois), 3)
+            for name in stats
+        }
+        return frames, series
+
+    frames, computed = compute_roi_stats(video_path, [rois[i] for i in missing], stats, **sampling)
+    os.makedirs(entry_dir, exist_ok=True)
+    np.save(frames_path, frames)
+    series = {name: np.empty((len(frames), len(rois), 3)) for name in stats}
+    for i, key in enumerate(roi_keys):
+        for name in stats:
+            if i in missing:
+                values = computed[name][:, missing.index(i), :]
+                np.save(column_path(key, name), values)
+            else:
+                values = np.load(column_path(key, name))
+            series[name][:, i, :] = values
+    evict_analysis_cache(cache_dir, max_bytes)
+    return frames, series
+
+# フレームプレビュー用の設定
+FRAME_CACHE_BYTES = 512 * 1024 * 1024  # デコード済みフレームのキャッシュ上限
+THUMB_SIZE = (160, 128)  # サムネイル索引の1枚の大きさ
+MAX_THUMBNAILS = 1000  # サムネイル索引の最大枚数 (間隔はこれに収まるように決める)
+PREVIEW_POLL_MS = 15
+
+class FrameCache:
+    """デコード済みフレームのLRUキャッシュ (合計バイト数で上限を設ける)"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, frame_number):
+        with self.lock:
+            frame = self.frames.get(frame_number)
+            if frame is not None:
+                self.frames.move_to_end(frame_number)
+            return frame
+
+    def put(self, frame_number, frame):
+        with self.lock:
+            if frame_number in self.frames or frame.nbytes > self.max_bytes:
+                return
+            self.frames[frame_number] = frame
+            self.total_bytes += frame.nbytes
+            while self.total_bytes > self.max_bytes:
+                _, old = self.frames.popitem(last=False)
+                self.total_bytes -= old.nbytes
+
+class ThumbnailIndex:
+    """一定間隔のフレームを縮小して1つの配列に格納するサムネイル索引 (バックグラウンドで作成)"""
+    def __init__(self, video_path, frame_count, size=THUMB_SIZE, max_thumbnails=MAX_THUMBNAILS):
+        self.interval = max(1, -(-frame_count // max_thumbnails))
+        self.count = -(-frame_count // self.interval) if frame_count > 0 else 0
+        self.thumbs = np.zeros((self.count, size[1], size[0], 3), dtype=np.uint8)
+        self.ready = np.zeros(self.count, dtype=bool)
+        self.size = size
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._build, args=(video_path,), daemon=True)
+        self.thread.start()
+
+    def _build(self, video_path):
+        cap = cv2.VideoCapture(video_path)
+        for idx, frame in read_frames(cap, range(0, self.count * self.interval, self.interval)):
+            if self.stopped.is_set():
+                break
+            small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+            self.thumbs[idx // self.interval] = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+            self.ready[idx // self.interval] = True
+        cap.release()
+
+    def nearest(self, frame_number):
+        """指定フレームに最も近い作成済みサムネイル (RGB) を返します。まだ無ければ None"""
+        if self.count == 0:
+            return None
+        i = min(self.count - 1, int(round(frame_number / self.interval)))
+        return self.thumbs[i] if self.ready[i] else None
+
+    def stop(self):
+        self.stopped.set()
+
+class ScrubPreview:
+    """
+    スクロール中のフレーム表示を担当します。
+    要求は最新の1件だけを保持し (古い要求は捨てる)、デコードは専用スレッドで行います。
+    """
+    def __init__(self, video_path, display_size, cache_bytes=FRAME_CACHE_BYTES):
+        self.display_size = display_size
+        self.cap = cv2.VideoCapture(video_path)
+        self.cache = FrameCache(cache_bytes)
+        self.index = ThumbnailIndex(video_path, int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        self.next_pos = 0  # cap が次に返すフレーム番号
+        self.pending = None
+        self.result = None
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self.thread.start()
+
+    def thumbnail(self, frame_number):
+        return self.index.nearest(frame_number)
+
+    def request(self, frame_number):
+        with self.cond:
+            self.pending = frame_number
+            self.cond.notify()
+
+    def take_result(self):
+        with self.cond:
+            result, self.result = self.result, None
+            return result
+
+    def close(self):
+        self.index.stop()
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def _read(self, frame_number):
+        frame = self.cache.get(frame_number)
+        if frame is not None:
+            return frame
+        if frame_number != self.next_pos:
+            # 連続したフレームならシークせずにそのまま読む
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        ret, frame = self.cap.read()
+        if not ret:
+            self.next_pos = -1
+            return None
+        self.next_pos = frame_number + 1
+        self.cache.put(frame_number, frame)
+        return frame
+
+    def _decode_loop(self):
+        while True:
+            with self.cond:
+                while self.pending is None and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    break
+                frame_number, self.pending = self.pending, None
+            frame = self._read(frame_number)
+            if frame is None:
+                continue
+            # 縮小してから色変換する (変換するのは表示サイズの画素だけ)
+            resized = cv2.cvtColor(cv2.resize(frame, self.display_size), cv2.COLOR_BGR2RGB)
+            with self.cond:
+                self.result = (frame_number, resized)
+        self.cap.release()
+
+# 解析オプションの入力欄を読み取る (空欄は未指定)
+def read_sampling_options():
+    def value(entry, cast):
+        text = entry.get().strip()
+        return cast(text) if text else None
+    return {
+        'stride': value(entry_stride, int) or 1,
+        'start_time': value(entry_start_time, float),
+        'end_time': value(entry_end_time, float),
+        'threshold': value(entry_threshold, float),
+        'keyframes_only': keyframes_only.get(),
+    }
+
 # 解析ボタンが押されたときに解析を実行
 def analyze_video():
     if not current_video or selected_x is None or selected_y is None:
         print("動画がロードされていないか、座標が選択されていません")
         return
 
-    cap = cv2.VideoCapture(current_video)
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    rgb_values = []
     region_size = int(entry_region_size.get())  # ユーザーが入力した取得領域サイズ
+    rois = roi_list or [point_roi(original_x, original_y, region_size)]
+    options = read_sampling_options()
+    if options['threshold'] and not options['keyframes_only']:
+        # 粗い間隔で解析し、変化の大きい区間だけ細かく解析
+        frames, series = compute_roi_stats_adaptive(
+            current_video, rois, coarse_stride=options['stride'], threshold=options['threshold'],
+            start_time=options['start_time'], end_time=options['end_time'])
+    else:
+        frames, series = cached_roi_stats(
+            current_video, rois, stride=options['stride'], start_time=options['start_time'],
+            end_time=options['end_time'], keyframes_only=options['keyframes_only'])
+    rgb_values = series['mean']
+    if len(rgb_values) == 0:
+        print("フレームを読み込めませんでした")
+        return
 
-    # 選択された座標近辺の平均RGB値を各フレームで取得
-    for frame_idx in range(frame_count):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        ret, frame = cap.read()
-        if ret:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    if len(rois) == 1:
+        # RGB値の変化をグラフで表示
+        plt.figure()
+        plt.plot(frames, rgb_values[:, 0, 0], color='red', label='R')
+        plt.plot(frames, rgb_values[:, 0, 1], color='green', label='G')
+        plt.plot(frames, rgb_values[:, 0, 2], color='blue', label='B')
+        plt.xlabel('Frame')
+        plt.ylabel('Average RGB')
+        plt.legend()
+        plt.show()
+        return
 
-            # 選択された点近辺の領域サイズを元の座標で計算
-            x1 = max(0, original_x - region_size // 2)
-            y1 = max(0, original_y - region_size // 2)
-            x2 = min(frame_rgb.shape[1], original_x + region_size // 2)
-            y2 = min(frame_rgb.shape[0], original_y + region_size // 2)
+    # 登録した全ROIについて、チャンネルごとにROIの平均値を表示
+    fig, axes = plt.subplots(3, 1, sharex=True)
+    for ch, (ax, name) in enumerate(zip(axes, ['R', 'G', 'B'])):
+        for roi_idx in range(rgb_values.shape[1]):
+            ax.plot(frames, rgb_values[:, roi_idx, ch], label=f'ROI {roi_idx + 1}')
+        ax.set_ylabel(f'Average {name}')
+    axes[-1].set_xlabel('Frame')
+    if rgb_values.shape[1] <= 10:
+        axes[0].legend()
+    plt.show()
 
-            # 選択された領域の平均RGBを計算
-            region = frame_rgb[y1:y2, x1:x2]
-            avg_color = np.mean(region, axis=(0, 1))  # 近辺の平均RGB値
-            rgb_values.append(avg_color)
+if __name__ == "__main__":
+    # Tkinter ウィンドウのセットアップ
+    root = tk.Tk()
+    root.title("動画解析アプリ")
+    root.geometry("800x600")
 
-    cap.release()
+    # 動画フレームを表示するラベル
+    label_image = tk.Label(root)
+    label_image.pack()
+    label_image.bind("<Button-1>", on_click)  # クリックイベントをバインド
+    label_image.bind("<Shift-Button-1>", on_shift_click)  # Shift+クリックでROIを追加
 
-    # RGB値の変化をグラフで表示
-    rgb_values = np.array(rgb_values)
-    plt.figure()
-    plt.plot(rgb_values[:, 0], color='red', label='R')
-    plt.plot(rgb_values[:, 1], color='green', label='G')
-    plt.plot(rgb_values[:, 2], color='blue', label='B')
-    plt.xlabel('Frame')
-    plt.ylabel('Average RGB')
-    plt.legend()
-    plt.show()
+    # ファイル読み込みボタン
+    btn_load = tk.Button(root, text="動画を読み込む", command=load_video)
+    btn_load.pack()
+
+    # 解析ボタン
+    btn_analyze = tk.Button(root, text="解析を開始", command=analyze_video)
+    btn_analyze.pack()
+
+    # 登録したROIのクリアボタン
+    btn_clear_rois = tk.Button(root, text="ROIをクリア", command=clear_rois)
+    btn_clear_rois.pack()
+
+    # RGB取得領域のサイズを入力するエントリーボックス
+    tk.Label(root, text="RGB取得領域サイズ (ピクセル)").pack()
+    entry_region_size = tk.Entry(root)
+    entry_region_size.insert(0, "5")  # デフォルトサイズ5x5
+    entry_region_size.pack()
+
+    # 解析するフレームの間引き・範囲の指定 (空欄は全フレーム)
+    sampling_frame = tk.Frame(root)
+    sampling_frame.pack()
+    tk.Label(sampling_frame, text="間引き間隔").grid(row=0, column=0)
+    entry_stride = tk.Entry(sampling_frame, width=6)
+    entry_stride.insert(0, "1")
+    entry_stride.grid(row=0, column=1)
+    tk.Label(sampling_frame, text="開始 (秒)").grid(row=0, column=2)
+    entry_start_time = tk.Entry(sampling_frame, width=6)
+    entry_start_time.grid(row=0, column=3)
+    tk.Label(sampling_frame, text="終了 (秒)").grid(row=0, column=4)
+    entry_end_time = tk.Entry(sampling_frame, width=6)
+    entry_end_time.grid(row=0, column=5)
+    tk.Label(sampling_frame, text="変化しきい値").grid(row=0, column=6)
+    entry_threshold = tk.Entry(sampling_frame, width=6)  # 指定すると変化の大きい区間だけ全フレームを解析
+    entry_threshold.grid(row=0, column=7)
+    keyframes_only = tk.BooleanVar(value=False)  # キーフレームだけを解析 (しきい値は使わない)
+    tk.Checkbutton(sampling_frame, text="キーフレームのみ", variable=keyframes_only).grid(row=0, column=8)
+
+    # 横スクロールバー
+    scrollbar = ttk.Scale(root, from_=0, to=100, orient="horizontal", command=on_scroll)
+    scrollbar.pack(fill="x")
+
+    # グローバル変数
+    current_video = ""
+    cap = None
+    selected_x = None
+    selected_y = None
+    original_x = None
+    original_y = None
+    roi_list = []
+    current_frame = 0
+    preview = None
+
+    # 画像の表示サイズを固定 (例: 500x400ピクセル)
+    fixed_width = 500
+    fixed_height = 400
+    resized_frame = None
+    original_width = None
+    original_height = None
+
+    # デコード済みフレームの表示を定期的に確認
+    root.after(PREVIEW_POLL_MS, poll_preview)
 
-# Tkinter ウィンドウのセットアップ
-root = tk.Tk()
-root.title("動画解析アプリ")
-root.geometry("800x600")
-
-# 動画フレームを表示するラベル
-label_image = tk.Label(root)
-label_image.pack()
-label_image.bind("<Button-1>", on_click)  # クリックイベントをバインド
-
-# ファイル読み込みボタン
-btn_load = tk.Button(root, text="動画を読み込む", command=load_video)
-btn_load.pack()
-
-# 解析ボタン
-btn_analyze = tk.Button(root, text="解析を開始", command=analyze_video)
-btn_analyze.pack()
-
-# RGB取得領域のサイズを入力するエントリーボックス
-tk.Label(root, text="RGB取得領域サイズ (ピクセル)").pack()
-entry_region_size = tk.Entry(root)
-entry_region_size.insert(0, "5")  # デフォルトサイズ5x5
-entry_region_size.pack()
-
-# 横スクロールバー
-scrollbar = ttk.Scale(root, from_=0, to=100, orient="horizontal", command=on_scroll)
-scrollbar.pack(fill="x")
-
-# グローバル変数
-current_video = ""
-cap = None
-selected_x = None
-selected_y = None
-original_x = None
-original_y = None
-current_frame = 0
-
-# 画像の表示サイズを固定 (例: 500x400ピクセル)
-fixed_width = 500
-fixed_height = 400
-resized_frame = None
-original_width = None
-original_height = None
-
-# メインループ
-root.mainloop()
+    # メインループ
+    root.mainloop()